@@ -0,0 +1,94 @@
+import json
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from benchmarks.scenarios import find_regressions, get_scenarios, run_scenario, stub_geocoder
+from benchmarks.seed import seed_dataset
+from jobs.queue import get_backend
+from places.geocoder import get_geocoder
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость API и страниц менеджера на синтетических данных в отдельной тестовой базе'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20, help='сколько создать ресторанов')
+        parser.add_argument('--products', type=int, default=200, help='сколько создать товаров, каждый есть в меню всех ресторанов')
+        parser.add_argument('--orders', type=int, default=5000, help='сколько создать заказов')
+        parser.add_argument('--addresses', type=int, default=2000, help='сколько разных адресов у заказов')
+        parser.add_argument('--seed', type=int, default=0, help='зерно генератора данных')
+        parser.add_argument('--repeat', type=int, default=5, help='сколько раз замерять каждый сценарий')
+        parser.add_argument('--scenario', action='append', help='замерять только этот сценарий, можно указать несколько раз')
+        parser.add_argument('--save-baseline', metavar='PATH', help='сохранить результаты в файл для сравнения')
+        parser.add_argument('--compare', metavar='PATH', help='сравнить результаты с сохранёнными и завершиться с ошибкой, если стало хуже')
+        parser.add_argument('--threshold', type=float, default=0.2, help='насколько можно стать медленнее, 0.2 — на 20%%')
+        parser.add_argument('--keepdb', action='store_true', help='не удалять тестовую базу после замеров')
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in get_scenarios()
+            if not options['scenario'] or scenario.name in options['scenario']
+        ]
+
+        old_database_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        # Replicas would serve production data, they read the test database like in tests
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            connections[alias].creation.set_as_test_mirror(connection.settings_dict)
+        try:
+            with stub_geocoder() as geocoder_url, override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                GEOCODER_URL=geocoder_url,
+                # Checkout geocodes right after commit, so the stub geocoder is in the timing
+                JOB_QUEUE_BACKEND='jobs.queue.ImmediateBackend',
+            ):
+                get_backend.cache_clear()
+                get_geocoder.cache_clear()
+                caches['default'].clear()
+
+                self.stdout.write('Создаю данные…')
+                dataset = seed_dataset(
+                    restaurants=options['restaurants'],
+                    products=options['products'],
+                    orders=options['orders'],
+                    addresses=options['addresses'],
+                    seed=options['seed'],
+                )
+                self.stdout.write(', '.join(f'{name}: {count}' for name, count in dataset.items()))
+
+                results = {}
+                for scenario in scenarios:
+                    results[scenario.name] = run_scenario(scenario, repeat=options['repeat'])
+                    self.stdout.write(
+                        '{name:<20} {wall_time_ms:>10} мс (макс. {wall_time_max_ms}), '
+                        'запросов к БД: {queries}, пик памяти: {peak_memory_kb} КБ'.format(
+                            name=scenario.name,
+                            **results[scenario.name],
+                        )
+                    )
+        finally:
+            get_backend.cache_clear()
+            get_geocoder.cache_clear()
+            connection.creation.destroy_test_db(old_database_name, verbosity=0, keepdb=options['keepdb'])
+
+        report = {'dataset': dataset, 'results': results}
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            if baseline['dataset'] != dataset:
+                self.stderr.write(f"Базовые замеры сделаны на других данных: {baseline['dataset']}")
+            regressions = find_regressions(results, baseline['results'], options['threshold'])
+            for regression in regressions:
+                self.stderr.write(regression)
+            if regressions:
+                raise CommandError('Сценарии стали медленнее базовых замеров', returncode=1)
+            self.stdout.write('Хуже не стало')
@@ -0,0 +1,143 @@
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from foodcartapp.models import Product
+from .seed import MANAGER_USERNAME
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    """Answers like the Yandex geocoder with the same point for every address."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = json.dumps({'response': {'GeoObjectCollection': {'featureMember': [
+            {'GeoObject': {'Point': {'pos': '37.617635 55.755814'}}},
+        ]}}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def stub_geocoder():
+    """Run the stub geocoder on a free local port, yields its url."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}/'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class Scenario:
+    def __init__(self, name, request):
+        self.name = name
+        self.request = request
+
+    def prepare(self, client):
+        """Return keyword arguments of the request, called before every run."""
+        return {}
+
+
+class RegisterOrderScenario(Scenario):
+    def __init__(self):
+        super().__init__('register_order', self.post_order)
+        self.product_ids = None
+        self.run_number = 0
+
+    def prepare(self, client):
+        if self.product_ids is None:
+            self.product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:3])
+        self.run_number += 1
+        # Every run checks out a new address, so the geocoder is asked every time
+        return {'address': f'Москва, улица Замеров, {self.run_number}'}
+
+    def post_order(self, client, address):
+        order = {
+            'products': [{'product': product_id, 'quantity': 1} for product_id in self.product_ids],
+            'firstname': 'Иван',
+            'lastname': 'Бенчмарков',
+            'phonenumber': '+79991234567',
+            'address': address,
+        }
+        return client.post('/api/order/', json.dumps(order), content_type='application/json')
+
+
+def get_scenarios():
+    return [
+        Scenario('product_list_api', lambda client: client.get('/api/products/')),
+        RegisterOrderScenario(),
+        Scenario('view_orders', lambda client: client.get('/manager/orders/')),
+        Scenario('view_products', lambda client: client.get('/manager/products/')),
+    ]
+
+
+def run_scenario(scenario, repeat=5, warmup=1):
+    """Time the scenario requests, returns wall time, query count and peak memory of a request.
+
+    Warm-up runs fill the caches and are not measured. Queries and memory are
+    taken from one more run, tracemalloc slows it down too much to time it.
+    """
+    client = Client()
+    client.login(username=MANAGER_USERNAME, password=MANAGER_USERNAME)
+
+    for _ in range(warmup):
+        scenario.request(client, **scenario.prepare(client))
+
+    timings = []
+    for _ in range(repeat):
+        kwargs = scenario.prepare(client)
+        started_at = time.perf_counter()
+        response = scenario.request(client, **kwargs)
+        timings.append(time.perf_counter() - started_at)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{scenario.name} answered {response.status_code}')
+
+    kwargs = scenario.prepare(client)
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            scenario.request(client, **kwargs)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time_ms': round(statistics.median(timings) * 1000, 2),
+        'wall_time_max_ms': round(max(timings) * 1000, 2),
+        'queries': len(queries.captured_queries),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline, threshold=0.2):
+    """Compare results with a saved baseline, returns descriptions of what got worse."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result['wall_time_ms'] > base['wall_time_ms'] * (1 + threshold):
+            regressions.append(f"{name}: время {base['wall_time_ms']} → {result['wall_time_ms']} мс")
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: запросов к БД {base['queries']} → {result['queries']}")
+        if result['peak_memory_kb'] > base['peak_memory_kb'] * (1 + threshold):
+            regressions.append(f"{name}: память {base['peak_memory_kb']} → {result['peak_memory_kb']} КБ")
+    return regressions
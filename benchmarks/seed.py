@@ -0,0 +1,118 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from foodcartapp.candidates import refresh_order_candidates
+from foodcartapp.models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+from places.models import Place
+
+MANAGER_USERNAME = 'benchmark-manager'
+
+# Synthetic addresses are spread over Moscow
+MIN_LATITUDE, MAX_LATITUDE = Decimal('55.55'), Decimal('55.90')
+MIN_LONGITUDE, MAX_LONGITUDE = Decimal('37.35'), Decimal('37.85')
+
+
+def random_coordinates(rng):
+    return (
+        round(MIN_LATITUDE + (MAX_LATITUDE - MIN_LATITUDE) * Decimal(rng.random()), 6),
+        round(MIN_LONGITUDE + (MAX_LONGITUDE - MIN_LONGITUDE) * Decimal(rng.random()), 6),
+    )
+
+
+def seed_dataset(restaurants=20, products=200, orders=5000, addresses=2000, availability=0.8,
+                 geocoded=0.9, seed=0):
+    """Fill an empty database with a reproducible synthetic catalog and order history.
+
+    Addresses are shared by orders, `geocoded` of them already have a place.
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+
+    User.objects.create_superuser(MANAGER_USERNAME, password=MANAGER_USERNAME)
+
+    created_restaurants = Restaurant.objects.bulk_create(
+        Restaurant(name=f'Star Burger {number}', address=f'Москва, ресторанная улица, {number}')
+        for number in range(restaurants)
+    )
+    restaurant_ids = [restaurant.id for restaurant in Restaurant.objects.order_by('id')]
+
+    ProductCategory.objects.bulk_create(
+        ProductCategory(name=name) for name in ['Бургеры', 'Напитки', 'Закуски', 'Десерты']
+    )
+    category_ids = list(ProductCategory.objects.values_list('id', flat=True))
+    Product.objects.bulk_create(
+        Product(
+            name=f'Товар {number}',
+            category_id=rng.choice(category_ids),
+            price=Decimal(rng.randint(5000, 90000)) / 100,
+            image=f'products/{number}.jpg',
+            description='Синтетический товар для замеров',
+        )
+        for number in range(products)
+    )
+    product_prices = dict(Product.objects.values_list('id', 'price'))
+    product_ids = list(product_prices)
+
+    RestaurantMenuItem.objects.bulk_create(
+        RestaurantMenuItem(restaurant_id=restaurant_id, product_id=product_id, availability=rng.random() < availability)
+        for restaurant_id in restaurant_ids
+        for product_id in product_ids
+    )
+
+    order_addresses = [f'Москва, улица Заказов, {number}' for number in range(addresses)]
+    places = [
+        Place(address=restaurant.address.lower(), last_request=today)
+        for restaurant in created_restaurants
+    ]
+    places += [
+        Place(address=address.lower(), last_request=today)
+        for address in order_addresses
+        if rng.random() < geocoded
+    ]
+    for place in places:
+        place.latitude, place.longitude = random_coordinates(rng)
+        place.update_geohash()
+    Place.objects.bulk_create(places)
+
+    statuses = [status for status, _ in Order.STATUS_CHOICES]
+    new_orders = []
+    orders_products = []
+    for _ in range(orders):
+        order_products = rng.sample(product_ids, k=rng.randint(1, 4))
+        quantities = [rng.randint(1, 3) for _ in order_products]
+        orders_products.append(list(zip(order_products, quantities)))
+        new_orders.append(Order(
+            firstname='Иван',
+            lastname='Бенчмарков',
+            phonenumber='+79991234567',
+            address=rng.choice(order_addresses),
+            status=rng.choice(statuses),
+            total=sum(product_prices[product_id] * quantity for product_id, quantity in orders_products[-1]),
+        ))
+    Order.info.bulk_create(new_orders, batch_size=500)
+
+    order_ids = Order.info.order_by('id').values_list('id', flat=True)
+    OrderItem.objects.bulk_create(
+        (
+            OrderItem(
+                order_id=order_id,
+                product_id=product_id,
+                quantity=quantity,
+                price=product_prices[product_id] * quantity,
+            )
+            for order_id, order_products in zip(order_ids, orders_products)
+            for product_id, quantity in order_products
+        ),
+        batch_size=1000,
+    )
+    refresh_order_candidates()
+    return {
+        'restaurants': restaurants,
+        'products': products,
+        'menu_items': restaurants * products,
+        'places': len(places),
+        'orders': orders,
+    }
@@ -13,6 +13,14 @@ import NoResults from "./components/NoResults";
 
 import './css/App.css';
 
+function generateIdempotencyKey(){
+  // crypto.randomUUID is available on https pages only
+  if (window.crypto && window.crypto.randomUUID){
+    return window.crypto.randomUUID();
+  }
+  return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
 class App extends Component {
 
   constructor(props){
@@ -62,6 +70,12 @@ class App extends Component {
 
     let csrfToken = document.querySelector("[name=csrfmiddlewaretoken]").value;
 
+    // Retries of the same order reuse the key, so the server does not create a duplicate
+    let body = JSON.stringify(data);
+    if (!this.checkoutRequest || this.checkoutRequest.body !== body){
+      this.checkoutRequest = {body, idempotencyKey: generateIdempotencyKey()};
+    }
+
     try {
       let response = await fetch(url, {
         method: 'post',
@@ -69,8 +83,9 @@ class App extends Component {
           'Accept': 'application/json',
           'Content-Type': 'application/json',
           'X-CSRFToken': csrfToken,
+          'Idempotency-Key': this.checkoutRequest.idempotencyKey,
         },
-        body: JSON.stringify(data),
+        body,
       });
 
       if (!response.ok){
@@ -79,6 +94,7 @@ class App extends Component {
       }
       let responseData = await response.json();
 
+      this.checkoutRequest = null;
       this.setState({
         cart: [],
       });
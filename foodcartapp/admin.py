@@ -29,6 +29,10 @@ class OrderAdmin(admin.ModelAdmin):
         'delivered_at',
         'comment',
         'restaurant',
+        'total',
+    )
+    readonly_fields = (
+        'total',
     )
     inlines = [
         OrderItemInline,
@@ -44,9 +48,12 @@ class OrderAdmin(admin.ModelAdmin):
 
     def save_formset(self, request, form, formset, change):
         instances = formset.save(commit=False)
+        for instance in formset.deleted_objects:
+            instance.delete()
         for instance in instances:
             instance.price = instance.quantity * instance.product.price
             instance.save()
+        form.instance.update_total()
 
     def save_model(self, request, obj, form, change):
 
@@ -72,6 +79,7 @@ class RestaurantAdmin(admin.ModelAdmin):
         'name',
         'address',
         'contact_phone',
+        'assembly_capacity',
     ]
     inlines = [
         RestaurantMenuItemInline
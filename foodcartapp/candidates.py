@@ -0,0 +1,121 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.transaction import atomic
+from django.utils import timezone
+
+from places.cache import get_coordinates, normalize_address
+from .capabilities import RestaurantCapabilityIndex
+from .events import ORDER_UPDATED, publish_order_event
+from .locations import RestaurantLocations
+from .models import Order, OrderCandidate, OrderItem, Restaurant
+
+
+def get_unassigned_orders():
+    # Finished orders are not on the board, their candidates are never looked at
+    return Order.info.filter(restaurant__isnull=True).exclude(status=Order.DONE)
+
+
+def build_candidates(orders, restaurants):
+    """Nearest restaurants able to cook each order, restaurants at unknown distance last.
+
+    Only restaurants within ORDER_CANDIDATES_RADIUS_KM of the client are looked at,
+    and at most ORDER_CANDIDATES_LIMIT nearest of them are kept. If none of them is
+    that near, all the able restaurants are listed, so that the order can still be cooked.
+    """
+    order_ids = [order_id for order_id, _ in orders]
+    order_product_ids = {}
+    for order_id, product_id in OrderItem.objects.filter(order_id__in=order_ids).values_list('order_id', 'product_id'):
+        order_product_ids.setdefault(order_id, set()).add(product_id)
+    capability_index = RestaurantCapabilityIndex.get(
+        product_id for product_ids in order_product_ids.values() for product_id in product_ids
+    )
+    locations = RestaurantLocations.get()
+    coordinates = get_coordinates([address for _, address in orders])
+
+    candidates = []
+    for order_id, address in orders:
+        restaurant_ids = [
+            restaurant_id
+            for restaurant_id in capability_index.candidate_restaurant_ids(order_product_ids.get(order_id, ()))
+            if restaurant_id in restaurants
+        ]
+        client_coordinates = coordinates.get(normalize_address(address))
+        if client_coordinates:
+            order_candidates = locations.nearest(
+                client_coordinates,
+                restaurant_ids,
+                settings.ORDER_CANDIDATES_LIMIT,
+                settings.ORDER_CANDIDATES_RADIUS_KM,
+            )
+            if not order_candidates:
+                order_candidates = locations.nearest(client_coordinates, restaurant_ids, len(restaurant_ids), None)
+            order_candidates += [
+                (restaurant_id, None) for restaurant_id in restaurant_ids
+                if restaurant_id in locations.unlocated_restaurant_ids
+            ]
+        else:
+            order_candidates = [(restaurant_id, None) for restaurant_id in restaurant_ids]
+
+        candidates += [
+            OrderCandidate(
+                order_id=order_id,
+                restaurant_id=restaurant_id,
+                distance_km=None if distance_km is None else Decimal(distance_km).quantize(Decimal('0.001')),
+                rank=rank,
+            )
+            for rank, (restaurant_id, distance_km) in enumerate(order_candidates)
+        ]
+    return candidates
+
+
+def refresh_order_candidates(order_ids=None, chunk_size=500):
+    """Recompute candidate restaurants of the orders, of all open unassigned ones by default.
+
+    Orders assigned to a restaurant or finished lose their candidates, the board does not show them.
+    """
+    if order_ids is None:
+        # Leftovers of orders which got a restaurant or were finished while jobs were not running
+        OrderCandidate.objects.exclude(order__in=get_unassigned_orders()).delete()
+        order_ids = get_unassigned_orders().values_list('id', flat=True)
+    order_ids = sorted(order_ids)
+    restaurants = Restaurant.objects.in_bulk()
+
+    refreshed_count = 0
+    for chunk_start in range(0, len(order_ids), chunk_size):
+        chunk_ids = order_ids[chunk_start:chunk_start + chunk_size]
+        orders = list(get_unassigned_orders().filter(id__in=chunk_ids).values_list('id', 'address'))
+        candidates = build_candidates(orders, restaurants)
+        with atomic():
+            OrderCandidate.objects.filter(order_id__in=chunk_ids).delete()
+            OrderCandidate.objects.bulk_create(candidates)
+            # update() sends no post_save, which would enqueue this refresh again
+            Order.info.filter(id__in=[order_id for order_id, _ in orders]).update(candidates_refreshed_at=timezone.now())
+            # Open boards reload rows of the orders, after the commit
+            for order_id, _ in orders:
+                publish_order_event(order_id, ORDER_UPDATED)
+        refreshed_count += len(orders)
+    return refreshed_count
+
+
+def refresh_product_candidates(product_id):
+    """Recompute candidates of unassigned orders with the product, after its availability changes."""
+    return refresh_order_candidates(
+        get_unassigned_orders().filter(order_items__product_id=product_id).values_list('id', flat=True).distinct()
+    )
+
+
+def refresh_address_candidates(address):
+    """Recompute candidates after coordinates of the address arrive or change.
+
+    A restaurant address moves distances of every unassigned order, a client address only of its orders.
+    """
+    address = normalize_address(address)
+    restaurant_addresses = Restaurant.objects.values_list('address', flat=True)
+    if address in {normalize_address(restaurant_address) for restaurant_address in restaurant_addresses}:
+        return refresh_order_candidates()
+    return refresh_order_candidates([
+        order_id
+        for order_id, order_address in get_unassigned_orders().values_list('id', 'address')
+        if normalize_address(order_address) == address
+    ])
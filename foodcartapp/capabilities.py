@@ -0,0 +1,108 @@
+from star_burger import caching
+from star_burger.db_router import read_from_primary
+from .models import Restaurant, RestaurantMenuItem
+
+# Rows are rewritten on every menu change, the timeout only limits how long a row missed by that lives
+CAPABILITY_CACHE_TIMEOUT = 60 * 60
+
+
+class RestaurantCapabilityIndex:
+    """Which restaurants can cook which products.
+
+    Every restaurant gets a bit, every product a row: the mask of restaurants having it
+    in stock, so restaurants able to cook an order are the AND of its products rows.
+    Rows are cached one per product, a menu change rewrites only the row of its product.
+    """
+
+    def __init__(self, restaurant_ids, product_masks):
+        self.restaurant_ids = restaurant_ids
+        self.product_masks = product_masks
+        self.restaurant_bits = {restaurant_id: 1 << bit for bit, restaurant_id in enumerate(restaurant_ids)}
+
+    @staticmethod
+    @read_from_primary()
+    def load_restaurant_ids():
+        return list(Restaurant.objects.order_by('name', 'id').values_list('id', flat=True))
+
+    @staticmethod
+    def get_available_menu_items(product_ids):
+        return RestaurantMenuItem.objects\
+            .filter(availability=True, product_id__in=product_ids)\
+            .values_list('product_id', 'restaurant_id')
+
+    @classmethod
+    @read_from_primary()
+    def load_product_masks(cls, restaurant_ids, product_ids):
+        restaurant_bits = {restaurant_id: 1 << bit for bit, restaurant_id in enumerate(restaurant_ids)}
+        product_masks = dict.fromkeys(product_ids, 0)
+        for product_id, restaurant_id in cls.get_available_menu_items(product_ids):
+            product_masks[product_id] |= restaurant_bits.get(restaurant_id, 0)
+        return product_masks
+
+    @classmethod
+    def get(cls, product_ids):
+        """Load rows of the products, building the missing ones with a single query."""
+        cache = caching.get_cache()
+        version = caching.get_namespace_version(caching.RESTAURANT_CAPABILITY)
+        restaurant_ids = cache.get_or_set(
+            caching.make_key(caching.RESTAURANT_CAPABILITY, 'restaurants', version=version),
+            cls.load_restaurant_ids,
+            CAPABILITY_CACHE_TIMEOUT,
+        )
+
+        cache_keys = {
+            caching.make_key(caching.RESTAURANT_CAPABILITY, 'product', product_id, version=version): product_id
+            for product_id in set(product_ids)
+        }
+        product_masks = {cache_keys[key]: mask for key, mask in cache.get_many(cache_keys).items()}
+        missing_product_ids = set(cache_keys.values()) - product_masks.keys()
+        if missing_product_ids:
+            loaded_masks = cls.load_product_masks(restaurant_ids, missing_product_ids)
+            cache.set_many(
+                {
+                    caching.make_key(caching.RESTAURANT_CAPABILITY, 'product', product_id, version=version): mask
+                    for product_id, mask in loaded_masks.items()
+                },
+                CAPABILITY_CACHE_TIMEOUT,
+            )
+            product_masks.update(loaded_masks)
+        return cls(restaurant_ids, product_masks)
+
+    @classmethod
+    def update_product(cls, product_id):
+        """Rewrite the cached row of the product after its menu items change."""
+        cache = caching.get_cache()
+        version = caching.get_namespace_version(caching.RESTAURANT_CAPABILITY)
+        restaurant_ids = cache.get(caching.make_key(caching.RESTAURANT_CAPABILITY, 'restaurants', version=version))
+        if restaurant_ids is None:
+            # Nothing is cached in this version yet, rows are built on the next read
+            return
+        product_masks = cls.load_product_masks(restaurant_ids, [product_id])
+        cache.set(
+            caching.make_key(caching.RESTAURANT_CAPABILITY, 'product', product_id, version=version),
+            product_masks[product_id],
+            CAPABILITY_CACHE_TIMEOUT,
+        )
+
+    @staticmethod
+    def invalidate():
+        caching.invalidate(caching.RESTAURANT_CAPABILITY)
+
+    def restaurants_mask(self, product_ids):
+        mask = (1 << len(self.restaurant_ids)) - 1
+        for product_id in product_ids:
+            mask &= self.product_masks.get(product_id, 0)
+            if not mask:
+                break
+        return mask
+
+    def candidate_restaurant_ids(self, product_ids):
+        mask = self.restaurants_mask(product_ids)
+        return [
+            restaurant_id
+            for bit, restaurant_id in enumerate(self.restaurant_ids)
+            if mask >> bit & 1
+        ]
+
+    def is_available(self, product_id, restaurant_id):
+        return bool(self.product_masks.get(product_id, 0) & self.restaurant_bits.get(restaurant_id, 0))
@@ -0,0 +1,64 @@
+import datetime
+
+from star_burger import caching
+from .models import Product
+from .renderers import compress, dump_json
+
+
+def get_catalog_version():
+    """Version of the public catalog, the time of its last change in milliseconds."""
+    return caching.get_namespace_version(caching.CATALOG)
+
+
+def bump_catalog_version():
+    caching.invalidate(caching.CATALOG)
+
+
+def catalog_etag(request, *args, **kwargs):
+    return f'catalog-{get_catalog_version()}'
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return datetime.datetime.fromtimestamp(get_catalog_version() / 1000, tz=datetime.timezone.utc)
+
+
+def get_available_products():
+    return Product.objects.select_related('category').available()
+
+
+def serialize_products():
+    products = get_available_products()
+    dumped_products = []
+    for product in products:
+        dumped_product = {
+            'id': product.id,
+            'name': product.name,
+            'price': product.price,
+            'special_status': product.special_status,
+            'description': product.description,
+            'category': {
+                'id': product.category.id,
+                'name': product.category.name,
+            } if product.category else None,
+            'image': product.image.url,
+            'restaurant': {
+                'id': product.id,
+                'name': product.name,
+            }
+        }
+        dumped_products.append(dumped_product)
+    return dumped_products
+
+
+def get_products_payload(encoding=None):
+    """JSON of the available products, encoded and compressed once per catalog version."""
+    cache = caching.get_cache()
+    cache_key = caching.make_key(caching.CATALOG, 'products_payload', encoding)
+    payload = cache.get(cache_key)
+    if payload is None:
+        if encoding:
+            payload = compress(get_products_payload(), encoding)
+        else:
+            payload = dump_json(serialize_products())
+        cache.set(cache_key, payload, 60 * 60 * 24)
+    return payload
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django.core.checks import Warning, register
+
+from .events import CacheBroker, has_atomic_event_ids, is_broker_process_local
+
+
+@register(deploy=True)
+def check_order_events_broker(app_configs, **kwargs):
+    # The development server runs in one process
+    if settings.DEBUG or not is_broker_process_local():
+        return []
+    return [
+        Warning(
+            'Order events are kept inside one process, boards served by other workers miss them.',
+            hint='Use foodcartapp.events.CacheBroker in ORDER_EVENTS_BACKEND with a shared cache in CACHE_URL, '
+                 'or run a single worker.',
+            id='foodcartapp.W001',
+        ),
+    ]
+
+
+@register(deploy=True)
+def check_order_event_ids(app_configs, **kwargs):
+    if settings.DEBUG or is_broker_process_local():
+        return []
+    if not issubclass(import_string(settings.ORDER_EVENTS_BACKEND), CacheBroker) or has_atomic_event_ids():
+        return []
+    return [
+        Warning(
+            'Order events of workers publishing at once can get the same id, boards miss one of them.',
+            hint='Use memcached in CACHE_URL, the file and database caches do not increment atomically.',
+            id='foodcartapp.W002',
+        ),
+    ]
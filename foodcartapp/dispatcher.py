@@ -0,0 +1,163 @@
+import heapq
+from collections import namedtuple
+
+from django.db.models import Count, Q
+from django.db.transaction import atomic
+
+from .models import Order, OrderCandidate, Restaurant
+
+Assignment = namedtuple('Assignment', ['order_id', 'restaurant_id', 'distance_km'])
+
+
+class FlowGraph:
+    def __init__(self, node_count):
+        self.edges = [[] for _ in range(node_count)]
+
+    def add_edge(self, start, end, capacity, cost):
+        # An edge is [end, capacity, cost, index of the reverse edge]
+        self.edges[start].append([end, capacity, cost, len(self.edges[end])])
+        self.edges[end].append([start, 0, -cost, len(self.edges[start]) - 1])
+
+    def find_min_cost_flow(self, source, sink):
+        """Push as much flow as possible at the least cost, by shortest augmenting paths.
+
+        Dijkstra runs on costs reduced by node potentials, so the negative costs of
+        reverse edges do not break it, and stops as soon as it reaches the sink.
+        """
+        node_count = len(self.edges)
+        potentials = [0] * node_count
+        while True:
+            distances = [None] * node_count
+            previous = [None] * node_count
+            distances[source] = 0
+            queue = [(0, source)]
+            while queue:
+                distance, node = heapq.heappop(queue)
+                if node == sink:
+                    break
+                if distance > distances[node]:
+                    continue
+                for edge_index, (end, capacity, cost, _) in enumerate(self.edges[node]):
+                    if not capacity:
+                        continue
+                    end_distance = distance + cost + potentials[node] - potentials[end]
+                    if distances[end] is None or end_distance < distances[end]:
+                        distances[end] = end_distance
+                        previous[end] = node, edge_index
+                        heapq.heappush(queue, (end_distance, end))
+            if distances[sink] is None:
+                return
+            # The search stops at the sink, nodes farther than it are moved by the sink distance
+            for node in range(node_count):
+                if distances[node] is None or distances[node] > distances[sink]:
+                    potentials[node] += distances[sink]
+                else:
+                    potentials[node] += distances[node]
+
+            # Every path starts with an edge of capacity 1 from the source, so one unit is pushed at a time
+            node = sink
+            while node != source:
+                start, edge_index = previous[node]
+                edge = self.edges[start][edge_index]
+                edge[1] -= 1
+                self.edges[node][edge[3]][1] += 1
+                node = start
+
+
+def solve_assignment(order_costs, capacities):
+    """Assign as many orders as the capacities let, with the least total cost.
+
+    order_costs maps an order to {restaurant: cost}, capacities map a restaurant
+    to the number of orders it can still take. Returns {order: restaurant}.
+    """
+    orders = list(order_costs)
+    restaurants = [restaurant for restaurant, capacity in capacities.items() if capacity > 0]
+    order_nodes = {order: node for node, order in enumerate(orders, start=1)}
+    restaurant_nodes = {restaurant: node for node, restaurant in enumerate(restaurants, start=len(orders) + 1)}
+    source, sink = 0, len(orders) + len(restaurants) + 1
+
+    graph = FlowGraph(sink + 1)
+    for order, costs in order_costs.items():
+        graph.add_edge(source, order_nodes[order], 1, 0)
+        for restaurant, cost in costs.items():
+            if restaurant in restaurant_nodes:
+                graph.add_edge(order_nodes[order], restaurant_nodes[restaurant], 1, cost)
+    for restaurant, node in restaurant_nodes.items():
+        graph.add_edge(node, sink, capacities[restaurant], 0)
+
+    graph.find_min_cost_flow(source, sink)
+
+    node_restaurants = {node: restaurant for restaurant, node in restaurant_nodes.items()}
+    assignments = {}
+    for order, node in order_nodes.items():
+        for end, capacity, _, _ in graph.edges[node]:
+            if end in node_restaurants and not capacity:
+                assignments[order] = node_restaurants[end]
+    return assignments
+
+
+def get_free_capacities():
+    restaurants = Restaurant.objects.annotate(
+        assembling_count=Count('orders', filter=Q(orders__status=Order.ASSEMBLY)),
+    )
+    return {
+        restaurant.id: max(restaurant.assembly_capacity - restaurant.assembling_count, 0)
+        for restaurant in restaurants
+    }
+
+
+def plan_assignments():
+    """Match unprocessed orders with their candidate restaurants, nearest in total.
+
+    Restaurants get no more orders than their free assembly capacity. If there is not
+    enough of it, as many orders as possible are assigned. Candidates at unknown
+    distance are left to managers.
+    """
+    candidates = OrderCandidate.objects\
+        .filter(order__status=Order.UNPROCESSED, order__restaurant__isnull=True, distance_km__isnull=False)\
+        .values_list('order_id', 'restaurant_id', 'distance_km')
+    order_distances = {}
+    for order_id, restaurant_id, distance_km in candidates:
+        order_distances.setdefault(order_id, {})[restaurant_id] = distance_km
+
+    assignments = solve_assignment(
+        {
+            # Costs are whole metres, Dijkstra potentials of floats would drift
+            order_id: {restaurant_id: int(distance_km * 1000) for restaurant_id, distance_km in distances.items()}
+            for order_id, distances in order_distances.items()
+        },
+        get_free_capacities(),
+    )
+    return [
+        Assignment(order_id, restaurant_id, order_distances[order_id][restaurant_id])
+        for order_id, restaurant_id in sorted(assignments.items())
+    ]
+
+
+def dispatch_orders(dry_run=False):
+    """Assign restaurants to unprocessed orders and move them to assembly, like a manager in the admin does.
+
+    All assignments are saved in one transaction. Orders changed by a manager meanwhile are skipped.
+    """
+    if dry_run:
+        return plan_assignments()
+
+    with atomic():
+        # Locked so that concurrent dispatchers do not overfill restaurants
+        list(Restaurant.objects.select_for_update().values_list('id', flat=True))
+        assignments = plan_assignments()
+        orders = Order.info\
+            .select_for_update()\
+            .filter(id__in=[assignment.order_id for assignment in assignments], status=Order.UNPROCESSED, restaurant__isnull=True)\
+            .in_bulk()
+        saved_assignments = []
+        for assignment in assignments:
+            order = orders.get(assignment.order_id)
+            if not order:
+                continue
+            order.restaurant_id = assignment.restaurant_id
+            order.status = Order.ASSEMBLY
+            # Saved one by one, so the order board and candidates get their signals
+            order.save(update_fields=['restaurant', 'status'])
+            saved_assignments.append(assignment)
+    return saved_assignments
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import BaseMemcachedCache
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+ORDER_CREATED = 'created'
+ORDER_UPDATED = 'updated'
+ORDER_DELETED = 'deleted'
+
+
+def get_initial_event_id():
+    # Ids keep growing after a restart, so clients reconnecting with an old Last-Event-ID are not stuck
+    return int(time.time() * 1000)
+
+
+class InProcessBroker:
+    """Keeps recent order events in memory, works for a single server process."""
+
+    def __init__(self, history_size=1000):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=history_size)
+        self.last_event_id = get_initial_event_id()
+
+    def publish(self, event):
+        with self.condition:
+            self.last_event_id += 1
+            self.events.append((self.last_event_id, event))
+            self.condition.notify_all()
+
+    def get_last_event_id(self):
+        return self.last_event_id
+
+    def listen(self, last_event_id, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_event_id > last_event_id, timeout)
+            return [(event_id, event) for event_id, event in self.events if event_id > last_event_id]
+
+
+class CacheBroker:
+    """Keeps recent order events in the shared cache, so all server processes see them."""
+
+    last_event_id_key = 'foodcartapp:order_events:last_id'
+    event_key = 'foodcartapp:order_events:{event_id}'
+
+    def __init__(self, history_size=1000, event_ttl=300, poll_interval=1.0):
+        self.history_size = history_size
+        self.event_ttl = event_ttl
+        self.poll_interval = poll_interval
+
+    def publish(self, event):
+        cache.add(self.last_event_id_key, get_initial_event_id(), None)
+        event_id = cache.incr(self.last_event_id_key)
+        cache.set(self.event_key.format(event_id=event_id), event, self.event_ttl)
+
+    def get_last_event_id(self):
+        cache.add(self.last_event_id_key, get_initial_event_id(), None)
+        return cache.get(self.last_event_id_key)
+
+    def listen(self, last_event_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            current_event_id = self.get_last_event_id()
+            if current_event_id > last_event_id:
+                event_ids = range(max(last_event_id + 1, current_event_id - self.history_size + 1), current_event_id + 1)
+                events = cache.get_many([self.event_key.format(event_id=event_id) for event_id in event_ids])
+                events = [
+                    (event_id, events[self.event_key.format(event_id=event_id)])
+                    for event_id in event_ids
+                    if self.event_key.format(event_id=event_id) in events
+                ]
+                if events:
+                    return events
+                # Expired or evicted, waiting for them again would make the caller spin
+                last_event_id = current_event_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            time.sleep(min(self.poll_interval, remaining))
+
+
+def is_broker_process_local():
+    """Whether events published in one server process stay unseen by the others."""
+    broker_class = import_string(settings.ORDER_EVENTS_BACKEND)
+    if issubclass(broker_class, InProcessBroker):
+        return True
+    if issubclass(broker_class, CacheBroker):
+        return isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+    return False
+
+
+def has_atomic_event_ids():
+    """Whether CacheBroker gets a unique id for every event, only memcached increments atomically.
+
+    Other backends read and write the counter, two processes publishing at once get the same id.
+    """
+    return isinstance(caches[DEFAULT_CACHE_ALIAS], BaseMemcachedCache)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(settings.ORDER_EVENTS_BACKEND)()
+
+
+def publish_order_event(order_id, event_type):
+    # Listeners fetch the order right away, so it has to be committed first
+    transaction.on_commit(lambda: get_broker().publish({'order': order_id, 'type': event_type}))
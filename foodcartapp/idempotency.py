@@ -0,0 +1,42 @@
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_KEY_MAX_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+def get_request_hash(data):
+    """Fingerprint of the request body, a key must not be reused for another request."""
+    dumped_data = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(dumped_data.encode()).hexdigest()
+
+
+def get_stored_key(key):
+    return IdempotencyKey.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+
+
+def store_response(key, request_hash, response):
+    """Save the response of the first request with the key.
+
+    Call it in the transaction saving the results of the request: a concurrent
+    request with the same key fails here with IntegrityError and is rolled back.
+    """
+    now = timezone.now()
+    IdempotencyKey.objects.filter(key=key, expires_at__lte=now).delete()
+    return IdempotencyKey.objects.create(
+        key=key,
+        request_hash=request_hash,
+        response=response,
+        expires_at=now + datetime.timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    )
+
+
+def delete_expired_keys():
+    deleted_count, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted_count
@@ -0,0 +1,117 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import connection
+from django.db.transaction import atomic
+
+from jobs.queue import enqueue
+from .events import ORDER_CREATED, publish_order_event
+from .models import Order, OrderItem, Product
+from .serializers import OrderSerializer
+
+CSV_FIELDS = ['firstname', 'lastname', 'phonenumber', 'address', 'products']
+
+
+def read_json_lines(lines):
+    """Yield (row number, order data) pairs, one order object per line."""
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield row_number, json.loads(line)
+        except ValueError as error:
+            yield row_number, error
+
+
+def parse_csv_products(products):
+    """Parse products column like `1:2;3:1`, product id and quantity pairs."""
+    order_items = []
+    for order_item in products.split(';'):
+        if not order_item.strip():
+            continue
+        product, _, quantity = order_item.partition(':')
+        order_items.append({'product': product.strip(), 'quantity': quantity.strip()})
+    return order_items
+
+
+def read_csv(lines):
+    """Yield (row number, order data) pairs from CSV with a header of CSV_FIELDS."""
+    reader = csv.DictReader(lines)
+    for row_number, row in enumerate(reader, start=2):
+        row['products'] = parse_csv_products(row.get('products') or '')
+        yield row_number, row
+
+
+def get_product_ids(rows):
+    product_ids = set()
+    for _, data in rows:
+        if not isinstance(data, dict) or not isinstance(data.get('products'), list):
+            continue
+        for order_item in data['products']:
+            try:
+                product_ids.add(int(order_item['product']))
+            except (KeyError, TypeError, ValueError):
+                pass
+    return product_ids
+
+
+def save_orders(validated_orders):
+    orders = [
+        Order(
+            **{field: value for field, value in validated_order.items() if field != 'products'},
+            total=OrderSerializer.get_order_total(validated_order['products']),
+        )
+        for validated_order in validated_orders
+    ]
+    with atomic():
+        if connection.features.can_return_rows_from_bulk_insert:
+            Order.info.bulk_create(orders)
+            # bulk_create does not send post_save, so the order board is notified here
+            for order in orders:
+                publish_order_event(order.id, ORDER_CREATED)
+            enqueue('foodcartapp.refresh_order_candidates', order_ids=[order.id for order in orders])
+        else:
+            # Primary keys are needed for order items, but this database does not return them from bulk insert
+            for order in orders:
+                order.save()
+
+        order_items = []
+        for order, validated_order in zip(orders, validated_orders):
+            order_items += OrderSerializer.build_order_items(order, validated_order['products'])
+        OrderItem.objects.bulk_create(order_items)
+
+        enqueue('places.geocode_addresses', addresses=sorted({order.address for order in orders}))
+    return orders
+
+
+def import_orders(rows, chunk_size=500):
+    """Validate and save orders chunk by chunk.
+
+    Invalid rows are reported and skipped, the rest of the chunk is still saved.
+    Returns the number of created orders and a list of row errors.
+    """
+    rows = iter(rows)
+    created_count = 0
+    errors = []
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        context = {'products': Product.objects.in_bulk(get_product_ids(chunk))}
+        validated_orders = []
+        for row_number, data in chunk:
+            if isinstance(data, Exception):
+                errors.append({'row': row_number, 'errors': str(data)})
+                continue
+            serializer = OrderSerializer(data=data, context=context)
+            if serializer.is_valid():
+                validated_orders.append(serializer.validated_data)
+            else:
+                errors.append({'row': row_number, 'errors': serializer.errors})
+
+        if validated_orders:
+            created_count += len(save_orders(validated_orders))
+
+    return created_count, errors
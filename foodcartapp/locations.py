@@ -0,0 +1,73 @@
+from places.cache import normalize_address
+from places.models import Place
+from places.spatial import GridIndex
+from star_burger import caching
+from star_burger.db_router import read_from_primary
+from .models import Restaurant
+
+# Dropped on every change of restaurants and their places, the timeout only limits how long a missed change lives
+LOCATIONS_CACHE_TIMEOUT = 60 * 60
+
+
+class RestaurantLocations:
+    """Restaurants bucketed by the geohash of their place, to find the ones near an address.
+
+    Restaurants whose address has no coordinates yet are kept aside, their distance is unknown.
+    """
+
+    def __init__(self, located_restaurants, unlocated_restaurant_ids, addresses):
+        self.grid = GridIndex(located_restaurants)
+        self.unlocated_restaurant_ids = unlocated_restaurant_ids
+        self.addresses = addresses
+
+    @classmethod
+    @read_from_primary()
+    def load(cls):
+        restaurant_addresses = {
+            restaurant_id: normalize_address(address)
+            for restaurant_id, address in Restaurant.objects.values_list('id', 'address')
+        }
+        places = Place.objects\
+            .filter(address__in=set(restaurant_addresses.values()), latitude__isnull=False, longitude__isnull=False)\
+            .values_list('address', 'latitude', 'longitude', 'geohash')
+        places = {address: (latitude, longitude, geohash) for address, latitude, longitude, geohash in places}
+
+        located_restaurants = [
+            (restaurant_id, *places[address])
+            for restaurant_id, address in restaurant_addresses.items()
+            if address in places
+        ]
+        unlocated_restaurant_ids = {
+            restaurant_id for restaurant_id, address in restaurant_addresses.items()
+            if address not in places
+        }
+        return cls(located_restaurants, unlocated_restaurant_ids, set(restaurant_addresses.values()))
+
+    @staticmethod
+    def get_cache_key():
+        # Bulk geocoding invalidates the whole places namespace, the locations follow it
+        places_version = caching.get_namespace_version(caching.PLACES)
+        return caching.make_key(caching.RESTAURANT_LOCATIONS, 'locations', places_version)
+
+    @classmethod
+    def get(cls):
+        return caching.get_cache().get_or_set(cls.get_cache_key(), cls.load, LOCATIONS_CACHE_TIMEOUT)
+
+    @classmethod
+    def forget_address(cls, address):
+        """Drop the cached locations if the place of the address belongs to a restaurant."""
+        locations = caching.get_cache().get(cls.get_cache_key())
+        if locations and normalize_address(address) in locations.addresses:
+            cls.invalidate()
+
+    @staticmethod
+    def invalidate():
+        caching.invalidate(caching.RESTAURANT_LOCATIONS)
+
+    def nearest(self, coordinates, restaurant_ids, k, radius_km):
+        """Up to k (restaurant id, distance in km) of the restaurants within the radius, nearest first.
+
+        No radius means any distance.
+        """
+        latitude, longitude = coordinates
+        return self.grid.nearest(latitude, longitude, k, radius_km, keys=set(restaurant_ids))
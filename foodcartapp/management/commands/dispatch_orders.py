@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.dispatcher import dispatch_orders
+from foodcartapp.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = 'Назначает необработанным заказам ближайшие рестораны с учётом того, сколько заказов они готовят одновременно'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='только показать назначения, не сохраняя их')
+
+    def handle(self, *args, **options):
+        assignments = dispatch_orders(dry_run=options['dry_run'])
+        restaurants = Restaurant.objects.in_bulk([assignment.restaurant_id for assignment in assignments])
+        for assignment in assignments:
+            self.stdout.write(
+                f'Заказ {assignment.order_id} → {restaurants[assignment.restaurant_id]}: {assignment.distance_km} км'
+            )
+        total_distance = sum(assignment.distance_km for assignment in assignments)
+        verb = 'Можно назначить' if options['dry_run'] else 'Назначено'
+        self.stdout.write(f'{verb} заказов: {len(assignments)}, общее расстояние: {total_distance} км')
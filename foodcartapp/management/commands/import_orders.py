@@ -0,0 +1,30 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from foodcartapp.importers import import_orders, read_csv, read_json_lines
+
+
+class Command(BaseCommand):
+    help = 'Импортирует заказы из файла JSON Lines или CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='путь к файлу, «-» для чтения из stdin')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='формат файла, по умолчанию по расширению')
+        parser.add_argument('--chunk-size', type=int, default=500, help='сколько заказов проверять и сохранять за раз')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'jsonl')
+        file = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        with file:
+            if file_format == 'csv':
+                rows = read_csv(file)
+            else:
+                rows = read_json_lines(file)
+            created_count, errors = import_orders(rows, chunk_size=options['chunk_size'])
+
+        for error in errors:
+            self.stderr.write(f"Строка {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(f'Создано заказов: {created_count}, ошибок: {len(errors)}')
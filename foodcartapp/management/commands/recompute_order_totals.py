@@ -0,0 +1,28 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from foodcartapp.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает сохранённые суммы заказов по их позициям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='только найти расхождения, ничего не меняя')
+        parser.add_argument('--batch-size', type=int, default=1000, help='сколько заказов обновлять за раз')
+
+    def handle(self, *args, **options):
+        mismatched_orders = []
+        for order in Order.info.total_price().order_by('id').iterator():
+            order_price = order.order_price or Decimal(0)
+            if order.total != order_price:
+                self.stdout.write(f'Заказ {order.id}: сохранено {order.total}, по позициям {order_price}')
+                order.total = order_price
+                mismatched_orders.append(order)
+
+        if not options['check']:
+            Order.info.bulk_update(mismatched_orders, ['total'], batch_size=options['batch_size'])
+        self.stdout.write(f'Заказов с неверной суммой: {len(mismatched_orders)}')
+        if options['check'] and mismatched_orders:
+            raise CommandError('Суммы заказов расходятся с их позициями', returncode=1)
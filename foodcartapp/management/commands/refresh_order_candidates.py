@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from foodcartapp.candidates import refresh_order_candidates
+
+
+class Command(BaseCommand):
+    help = 'Заново подбирает рестораны и расстояния для заказов без ресторана'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='сколько заказов обрабатывать за раз')
+
+    def handle(self, *args, **options):
+        refreshed_count = refresh_order_candidates(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Обработано заказов: {refreshed_count}')
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:12
+
+from decimal import Decimal
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def fill_order_totals(apps, schema_editor):
+    Order = apps.get_model('foodcartapp', 'Order')
+    orders = Order._default_manager.annotate(order_price=Sum('order_items__price'))
+    for order in orders.iterator():
+        order.total = order.order_price or Decimal(0)
+        order.save(update_fields=['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0051_alter_orderitem_price'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0'))], verbose_name='сумма заказа'),
+        ),
+        migrations.RunPython(fill_order_totals, migrations.RunPython.noop),
+    ]
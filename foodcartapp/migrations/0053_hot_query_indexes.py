@@ -0,0 +1,22 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:16
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0052_order_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(django.db.models.expressions.Case(django.db.models.expressions.When(status='UNPROCESSED', then=django.db.models.expressions.Value(1)), django.db.models.expressions.When(status='ASSEMBLY', then=django.db.models.expressions.Value(2)), django.db.models.expressions.When(status='DELIVERY', then=django.db.models.expressions.Value(3)), django.db.models.expressions.When(status='DONE', then=django.db.models.expressions.Value(4))), django.db.models.expressions.F('id'), condition=models.Q(('status', 'DONE'), _negated=True), name='open_order_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantmenuitem',
+            index=models.Index(fields=['availability', 'product'], name='menu_item_availability_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0054_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderCandidate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.DecimalField(blank=True, decimal_places=3, max_digits=8, null=True, verbose_name='расстояние до клиента, км')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='место в списке')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='foodcartapp.order', verbose_name='заказ')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_candidates', to='foodcartapp.restaurant', verbose_name='ресторан')),
+            ],
+            options={
+                'verbose_name': 'ресторан для заказа',
+                'verbose_name_plural': 'рестораны для заказов',
+                'ordering': ['order', 'rank'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ordercandidate',
+            constraint=models.UniqueConstraint(fields=('order', 'restaurant'), name='unique_order_candidate'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0055_order_candidate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='assembly_capacity',
+            field=models.PositiveSmallIntegerField(default=5, help_text='диспетчер не назначит ресторану больше готовящихся заказов', verbose_name='сколько заказов готовит одновременно'),
+        ),
+    ]
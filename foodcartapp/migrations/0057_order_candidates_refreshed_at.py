@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodcartapp', '0056_restaurant_assembly_capacity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='candidates_refreshed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='когда подобраны рестораны'),
+        ),
+    ]
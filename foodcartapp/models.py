@@ -1,8 +1,9 @@
 from decimal import Decimal
 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models import Sum, F, Case, Value, When
+from django.db.models import Sum, F, Case, Q, Value, When
 from django.utils import timezone
 from phonenumber_field.modelfields import PhoneNumberField
 
@@ -22,6 +23,11 @@ class Restaurant(models.Model):
         max_length=50,
         blank=True,
     )
+    assembly_capacity = models.PositiveSmallIntegerField(
+        'сколько заказов готовит одновременно',
+        default=5,
+        help_text='диспетчер не назначит ресторану больше готовящихся заказов',
+    )
 
     class Meta:
         verbose_name = 'ресторан'
@@ -123,23 +129,41 @@ class RestaurantMenuItem(models.Model):
         unique_together = [
             ['restaurant', 'product']
         ]
+        indexes = [
+            models.Index(fields=['availability', 'product'], name='menu_item_availability_idx'),
+        ]
 
     def __str__(self):
         return f"{self.restaurant.name} - {self.product.name}"
 
 
+ORDER_STATUS_PRIORITIES = {
+    'UNPROCESSED': 1,
+    'ASSEMBLY': 2,
+    'DELIVERY': 3,
+    'DONE': 4,
+}
+
+
+def get_priority_order():
+    # Exactly this expression is indexed in Order.Meta, so sorting by it can use the index
+    return Case(
+        *[When(status=status, then=Value(priority)) for status, priority in ORDER_STATUS_PRIORITIES.items()]
+    )
+
+
 class OrderQuerySet(models.QuerySet):
     def total_price(self):
         return self.annotate(order_price=Sum(F('order_items__price')))
 
     def order_by_priority(self):
-        priority_order = Case(
-            When(status=Order.UNPROCESSED, then=Value(1)),
-            When(status=Order.ASSEMBLY, then=Value(2)),
-            When(status=Order.DELIVERY, then=Value(3)),
-            When(status=Order.DONE, then=Value(4)),
+        return self.alias(priority_order=get_priority_order()).order_by('priority_order', 'id')
+
+    def after(self, priority, order_id):
+        """Orders following the given one in order_by_priority() ordering, for keyset pagination."""
+        return self.filter(
+            Q(priority_order__gt=priority) | Q(priority_order=priority, id__gt=order_id)
         )
-        return self.alias(priority_order=priority_order).order_by('priority_order', 'id')
 
 
 class Order(models.Model):
@@ -168,6 +192,7 @@ class Order(models.Model):
         (DELIVERY, 'Доставляется'),
         (DONE, 'Исполнен'),
     ]
+    STATUS_PRIORITIES = ORDER_STATUS_PRIORITIES
     status = models.CharField(
         'статус заказа',
         max_length=50,
@@ -227,15 +252,46 @@ class Order(models.Model):
         verbose_name='Ресторан для готовки заказа',
     )
 
+    total = models.DecimalField(
+        'сумма заказа',
+        max_digits=10,
+        decimal_places=2,
+        default=Decimal(0),
+        validators=[MinValueValidator(Decimal(0))],
+    )
+
+    candidates_refreshed_at = models.DateTimeField(
+        'когда подобраны рестораны',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
     info = OrderQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'заказ'
         verbose_name_plural = 'заказы'
+        indexes = [
+            # The manager board lists open orders by priority
+            models.Index(
+                get_priority_order(), 'id',
+                name='open_order_priority_idx',
+                condition=~Q(status='DONE'),
+            ),
+        ]
 
     def __str__(self):
         return f'{self.lastname} {self.firstname}, {self.address}'
 
+    @property
+    def priority(self):
+        return self.STATUS_PRIORITIES[self.status]
+
+    def update_total(self):
+        self.total = self.order_items.aggregate(total=Sum('price'))['total'] or Decimal(0)
+        self.save(update_fields=['total'])
+
 
 class OrderItem(models.Model):
     product = models.ForeignKey(
@@ -269,3 +325,51 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f'{self.quantity} - {self.product}'
+
+
+class OrderCandidate(models.Model):
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='candidates',
+        verbose_name='заказ',
+    )
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name='order_candidates',
+        verbose_name='ресторан',
+    )
+    distance_km = models.DecimalField(
+        'расстояние до клиента, км',
+        max_digits=8,
+        decimal_places=3,
+        null=True,
+        blank=True,
+    )
+    rank = models.PositiveSmallIntegerField('место в списке')
+
+    class Meta:
+        verbose_name = 'ресторан для заказа'
+        verbose_name_plural = 'рестораны для заказов'
+        ordering = ['order', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['order', 'restaurant'], name='unique_order_candidate'),
+        ]
+
+    def __str__(self):
+        return f'{self.order_id}: {self.restaurant}'
+
+
+class IdempotencyKey(models.Model):
+    key = models.CharField('ключ', max_length=255, unique=True)
+    request_hash = models.CharField('хэш запроса', max_length=64)
+    response = models.JSONField('ответ', encoder=DjangoJSONEncoder)
+    expires_at = models.DateTimeField('действует до', db_index=True)
+
+    class Meta:
+        verbose_name = 'ключ идемпотентности'
+        verbose_name_plural = 'ключи идемпотентности'
+
+    def __str__(self):
+        return self.key
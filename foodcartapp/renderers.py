@@ -0,0 +1,65 @@
+import gzip
+import json
+from decimal import Decimal
+
+import brotli
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+CONTENT_ENCODERS = {
+    'br': brotli.compress,
+    'gzip': gzip.compress,
+}
+
+
+class ApiJSONEncoder(JSONEncoder):
+    def default(self, obj):
+        # Prices are Decimals, strings keep them exact
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+def get_json_dumps_params():
+    if settings.API_JSON_COMPACT:
+        # Without indent the stdlib uses its C accelerated encoder
+        return {'ensure_ascii': False, 'separators': (',', ':')}
+    return {'ensure_ascii': False, 'indent': 4}
+
+
+def dump_json(data):
+    return json.dumps(data, cls=ApiJSONEncoder, **get_json_dumps_params()).encode()
+
+
+class ApiJSONRenderer(JSONRenderer):
+    encoder_class = ApiJSONEncoder
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        indent = super().get_indent(accepted_media_type, renderer_context)
+        if indent is None and not settings.API_JSON_COMPACT:
+            return 4
+        return indent
+
+
+def choose_content_encoding(request):
+    accepted_encodings = {}
+    for accepted in request.headers.get('Accept-Encoding', '').split(','):
+        encoding, _, params = accepted.partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                pass
+        accepted_encodings[encoding.strip().lower()] = quality
+
+    for encoding in CONTENT_ENCODERS:
+        if accepted_encodings.get(encoding, 0) > 0:
+            return encoding
+    return None
+
+
+def compress(payload, encoding):
+    return CONTENT_ENCODERS[encoding](payload)
@@ -1,13 +1,15 @@
+from collections import Counter
 from decimal import Decimal
 
-from django.shortcuts import get_object_or_404
 from phonenumber_field.serializerfields import PhoneNumberField
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import IntegerField, ModelSerializer, ValidationError
 
 from .models import Order, OrderItem, Product
 
 
 class OrderItemSerializer(ModelSerializer):
+    # Products are loaded for the whole cart at once in OrderSerializer.validate_products
+    product = IntegerField(min_value=1)
 
     class Meta:
         model = OrderItem
@@ -18,29 +20,48 @@ class OrderSerializer(ModelSerializer):
     products = OrderItemSerializer(many=True, allow_empty=False, write_only=True)
     phonenumber = PhoneNumberField(region='RU')
 
-    def create(self, validated_data):
-        order = Order(
-            firstname=validated_data['firstname'],
-            lastname=validated_data['lastname'],
-            phonenumber=validated_data['phonenumber'],
-            address=validated_data['address'],
-        )
-        order.save()
-
-        order_items = []
-        for product in validated_data['products']:
-            product_id = product['product'].id
-            product_price = get_object_or_404(Product.objects.values('price'), id=product_id)
-            print(product_price)
-            order_items.append(
-                OrderItem(
-                    **product,
-                    order=order,
-                    price=Decimal(product_price['price'] * product['quantity'])
-                )
+    def validate_products(self, order_items):
+        product_ids = [order_item['product'] for order_item in order_items]
+
+        duplicated_ids = [product_id for product_id, count in Counter(product_ids).items() if count > 1]
+        if duplicated_ids:
+            raise ValidationError(f'Товары указаны несколько раз: {duplicated_ids}')
+
+        # Bulk import preloads products of a whole chunk of orders
+        products = self.context.get('products')
+        if products is None:
+            products = Product.objects.in_bulk(product_ids)
+        unknown_ids = [product_id for product_id in product_ids if product_id not in products]
+        if unknown_ids:
+            raise ValidationError(f'Недопустимые первичные ключи товаров: {unknown_ids}')
+
+        return [
+            {**order_item, 'product': products[order_item['product']]}
+            for order_item in order_items
+        ]
+
+    @staticmethod
+    def build_order_items(order, order_items):
+        return [
+            OrderItem(
+                **order_item,
+                order=order,
+                price=order_item['product'].price * order_item['quantity'],
             )
+            for order_item in order_items
+        ]
+
+    @staticmethod
+    def get_order_total(order_items):
+        return sum(
+            (order_item['product'].price * order_item['quantity'] for order_item in order_items),
+            Decimal(0),
+        )
 
-        OrderItem.objects.bulk_create(order_items)
+    def create(self, validated_data):
+        order_items = validated_data.pop('products')
+        order = Order.info.create(**validated_data, total=self.get_order_total(order_items))
+        OrderItem.objects.bulk_create(self.build_order_items(order, order_items))
         return order
 
     class Meta:
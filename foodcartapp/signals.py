@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from jobs.queue import enqueue
+from places.cache import normalize_address
+from places.models import Place
+from .capabilities import RestaurantCapabilityIndex
+from .catalog import bump_catalog_version
+from .events import ORDER_CREATED, ORDER_DELETED, ORDER_UPDATED, publish_order_event
+from .locations import RestaurantLocations
+from .models import Order, OrderItem, Product, ProductCategory, Restaurant, RestaurantMenuItem
+
+# Saving only other fields, like the total, does not change order candidates
+ORDER_CANDIDATE_FIELDS = {'address', 'restaurant', 'status'}
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_capability_index(sender, **kwargs):
+    transaction.on_commit(RestaurantCapabilityIndex.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_restaurant_locations(sender, **kwargs):
+    transaction.on_commit(RestaurantLocations.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Place)
+def forget_restaurant_location(sender, instance, **kwargs):
+    transaction.on_commit(lambda: RestaurantLocations.forget_address(instance.address))
+
+
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def update_capability_index(sender, instance, **kwargs):
+    # The row is rebuilt from the database, so it has to see the committed menu
+    transaction.on_commit(lambda: RestaurantCapabilityIndex.update_product(instance.product_id))
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=ProductCategory)
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def invalidate_catalog(sender, **kwargs):
+    # Bumped before the commit, a concurrent reader could cache the old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_saved(sender, instance, created, **kwargs):
+    publish_order_event(instance.id, ORDER_CREATED if created else ORDER_UPDATED)
+
+
+@receiver(post_delete, sender=Order)
+def publish_order_deleted(sender, instance, **kwargs):
+    publish_order_event(instance.id, ORDER_DELETED)
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def publish_order_item_changed(sender, instance, **kwargs):
+    publish_order_event(instance.order_id, ORDER_UPDATED)
+
+
+@receiver(post_save, sender=Order)
+def refresh_saved_order_candidates(sender, instance, update_fields, **kwargs):
+    if update_fields is None or ORDER_CANDIDATE_FIELDS & set(update_fields):
+        enqueue('foodcartapp.refresh_order_candidates', order_ids=[instance.id])
+
+
+@receiver([post_save, post_delete], sender=OrderItem)
+def refresh_order_item_candidates(sender, instance, **kwargs):
+    enqueue('foodcartapp.refresh_order_candidates', order_ids=[instance.order_id])
+
+
+@receiver([post_save, post_delete], sender=RestaurantMenuItem)
+def refresh_menu_item_candidates(sender, instance, **kwargs):
+    enqueue('foodcartapp.refresh_product_candidates', product_id=instance.product_id)
+
+
+@receiver(pre_save, sender=Restaurant)
+def remember_restaurant_address(sender, instance, **kwargs):
+    instance.saved_address = Restaurant.objects.filter(pk=instance.pk).values_list('address', flat=True).first()
+
+
+@receiver(post_save, sender=Restaurant)
+def refresh_restaurant_candidates(sender, instance, created, **kwargs):
+    # A new restaurant has no menu yet, its menu items refresh candidates of their products
+    if created or normalize_address(instance.saved_address or '') == normalize_address(instance.address):
+        return
+    enqueue('foodcartapp.refresh_order_candidates')
+
+
+@receiver([post_save, post_delete], sender=Place)
+def refresh_place_candidates(sender, instance, **kwargs):
+    enqueue('foodcartapp.refresh_address_candidates', address=instance.address)
@@ -0,0 +1,17 @@
+from jobs.queue import task
+from .candidates import refresh_address_candidates, refresh_order_candidates, refresh_product_candidates
+
+
+@task('foodcartapp.refresh_order_candidates')
+def refresh_orders(order_ids=None):
+    refresh_order_candidates(order_ids)
+
+
+@task('foodcartapp.refresh_product_candidates')
+def refresh_product(product_id):
+    refresh_product_candidates(product_id)
+
+
+@task('foodcartapp.refresh_address_candidates')
+def refresh_address(address):
+    refresh_address_candidates(address)
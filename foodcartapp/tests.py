@@ -0,0 +1,421 @@
+import itertools
+import random
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from jobs.queue import DatabaseBackend, enqueue
+from places.geocoder import GeocoderClient
+from star_burger import caching
+from .candidates import build_candidates
+from .capabilities import CAPABILITY_CACHE_TIMEOUT, RestaurantCapabilityIndex
+from .catalog import get_catalog_version
+from .dispatcher import solve_assignment
+from .events import CacheBroker
+from .models import IdempotencyKey, Order, OrderCandidate, OrderItem, Product, Restaurant, RestaurantMenuItem
+
+# (longitude, latitude) answered by the geocoder, other addresses are not found
+GEOCODED_ADDRESSES = {
+    'москва, красная площадь 1': ('37.620800', '55.753900'),
+    'москва, арбат 1': ('37.599000', '55.752000'),
+    'москва, тверская 20': ('37.605000', '55.765000'),
+    'москва, новый арбат 10': ('37.615000', '55.753000'),
+    'санкт-петербург, невский 1': ('30.335100', '59.934300'),
+}
+
+
+class IdempotentCheckoutTest(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Чизбургер', price=100)
+        self.order_data = {
+            'products': [{'product': self.product.id, 'quantity': 2}],
+            'firstname': 'Иван',
+            'lastname': 'Петров',
+            'phonenumber': '+79001234567',
+            'address': 'Москва, Тверская 1',
+        }
+
+    def post_order(self, data, key):
+        return self.client.post('/api/order/', data, content_type='application/json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_first_response(self):
+        first_response = self.post_order(self.order_data, 'checkout-1')
+        retry_response = self.post_order(self.order_data, 'checkout-1')
+
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(retry_response.status_code, 200)
+        self.assertEqual(retry_response.json(), first_response.json())
+        self.assertEqual(retry_response['Idempotent-Replayed'], 'true')
+        self.assertFalse(first_response.has_header('Idempotent-Replayed'))
+        self.assertEqual(Order.info.count(), 1)
+
+    def test_key_reused_for_another_order_is_rejected(self):
+        self.post_order(self.order_data, 'checkout-1')
+
+        response = self.post_order({**self.order_data, 'address': 'Тверь'}, 'checkout-1')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('Idempotency-Key', response.json())
+        self.assertEqual(Order.info.count(), 1)
+
+    def test_other_keys_place_other_orders(self):
+        self.post_order(self.order_data, 'checkout-1')
+        self.post_order(self.order_data, 'checkout-2')
+
+        self.assertEqual(Order.info.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_invalid_order_stores_no_key(self):
+        response = self.post_order({**self.order_data, 'products': []}, 'checkout-1')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_too_long_key_is_rejected(self):
+        response = self.post_order(self.order_data, 'k' * 1000)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.info.exists())
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.restaurant = Restaurant.objects.create(name='Star Burger Арбат', address='Москва, Арбат 1')
+        self.product = Product.objects.create(name='Чизбургер', price=100, image='cheeseburger.jpg')
+
+    def get_product_names(self):
+        return [product['name'] for product in self.client.get('/api/products/').json()]
+
+    def test_version_changes_after_commit(self):
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.name = 'Двойной чизбургер'
+            self.product.save()
+            # Readers of the old version would cache the uncommitted change otherwise
+            self.assertEqual(get_catalog_version(), version)
+
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_products_follow_menu_changes(self):
+        self.assertEqual(self.get_product_names(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item = RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.product)
+        self.assertEqual(self.get_product_names(), ['Чизбургер'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            menu_item.availability = False
+            menu_item.save()
+        self.assertEqual(self.get_product_names(), [])
+
+    def test_unchanged_catalog_is_not_modified(self):
+        etag = self.client.get('/api/products/')['ETag']
+
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class CapabilityIndexTest(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.restaurant = Restaurant.objects.create(name='Star Burger Арбат', address='Москва, Арбат 1')
+        self.burger = Product.objects.create(name='Чизбургер', price=100)
+        self.fries = Product.objects.create(name='Картофель фри', price=50)
+        RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.burger)
+
+    def get_candidates(self, *products):
+        index = RestaurantCapabilityIndex.get([product.id for product in products])
+        return index.candidate_restaurant_ids([product.id for product in products])
+
+    def test_menu_change_updates_product_row(self):
+        self.assertEqual(self.get_candidates(self.burger, self.fries), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.restaurant, product=self.fries)
+
+        self.assertEqual(self.get_candidates(self.burger, self.fries), [self.restaurant.id])
+
+    def test_new_restaurant_is_indexed_after_commit(self):
+        self.get_candidates(self.burger)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant = Restaurant.objects.create(name='Star Burger Тверская', address='Москва, Тверская 1')
+            RestaurantMenuItem.objects.create(restaurant=restaurant, product=self.burger)
+            # The index rebuilt before the commit would miss the restaurant until its rows expire
+            self.get_candidates(self.burger)
+
+        self.assertCountEqual(self.get_candidates(self.burger), [self.restaurant.id, restaurant.id])
+
+    @skipUnless(isinstance(caching.get_cache(), LocMemCache), 'the clock is moved for the local memory cache')
+    def test_rows_expire(self):
+        self.get_candidates(self.burger)
+        version = caching.get_namespace_version(caching.RESTAURANT_CAPABILITY)
+        row_key = caching.make_key(caching.RESTAURANT_CAPABILITY, 'product', self.burger.id, version=version)
+        self.assertIsNotNone(caching.get_cache().get(row_key))
+
+        expired_at = time.time() + CAPABILITY_CACHE_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=expired_at):
+            self.assertIsNone(caching.get_cache().get(row_key))
+
+
+class OrderCandidatesTest(TestCase):
+    """Candidate restaurants as the manager board gets them, with jobs run as the worker would."""
+
+    def setUp(self):
+        caching.get_cache().clear()
+        geocoder_patcher = mock.patch.object(
+            GeocoderClient,
+            'fetch_coordinates',
+            side_effect=lambda address: GEOCODED_ADDRESSES.get(address),
+        )
+        geocoder_patcher.start()
+        self.addCleanup(geocoder_patcher.stop)
+
+        self.burger = Product.objects.create(name='Чизбургер', price=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.arbat = self.create_restaurant('Star Burger Арбат', 'Москва, Арбат 1')
+            self.tverskaya = self.create_restaurant('Star Burger Тверская', 'Москва, Тверская 20')
+        self.run_jobs()
+
+    def create_restaurant(self, name, address, products=None):
+        restaurant = Restaurant.objects.create(name=name, address=address)
+        for product in products or [self.burger]:
+            RestaurantMenuItem.objects.create(restaurant=restaurant, product=product)
+        return restaurant
+
+    def create_order(self, address='Москва, Красная площадь 1', products=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.info.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address=address)
+            for product in products or [self.burger]:
+                OrderItem.objects.create(order=order, product=product, quantity=1, price=product.price)
+            enqueue('places.geocode_address', address=address)
+        self.run_jobs()
+        return order
+
+    def run_jobs(self):
+        backend = DatabaseBackend()
+        while True:
+            with self.captureOnCommitCallbacks(execute=True):
+                processed = backend.run_pending()
+            if not processed:
+                return
+
+    @staticmethod
+    def get_candidates(order):
+        return [
+            (candidate.restaurant_id, None if candidate.distance_km is None else round(float(candidate.distance_km), 1))
+            for candidate in OrderCandidate.objects.filter(order=order)
+        ]
+
+    def test_nearest_restaurants_come_first(self):
+        order = self.create_order()
+
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6)])
+
+    @override_settings(ORDER_CANDIDATES_LIMIT=1)
+    def test_only_nearest_restaurants_are_kept(self):
+        order = self.create_order()
+
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4)])
+
+    @override_settings(ORDER_CANDIDATES_RADIUS_KM=10)
+    def test_far_restaurants_are_left_out(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_restaurant('Star Burger Невский', 'Санкт-Петербург, Невский 1')
+        self.run_jobs()
+
+        order = self.create_order()
+
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6)])
+
+    def test_restaurants_without_coordinates_come_last(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            unknown = self.create_restaurant('Star Burger Где-то', 'Нигде 1')
+        self.run_jobs()
+
+        order = self.create_order()
+
+        self.assertEqual(
+            self.get_candidates(order),
+            [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6), (unknown.id, None)],
+        )
+
+    def test_build_candidates_ranks_restaurants(self):
+        order = self.create_order()
+
+        candidates = build_candidates([(order.id, order.address)], Restaurant.objects.in_bulk())
+
+        self.assertEqual(
+            [(candidate.restaurant_id, candidate.rank) for candidate in candidates],
+            [(self.arbat.id, 0), (self.tverskaya.id, 1)],
+        )
+
+    def test_moved_restaurant_gets_new_distance(self):
+        order = self.create_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.arbat.address = 'Москва, Новый Арбат 10'
+            self.arbat.save()
+        self.run_jobs()
+
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 0.4), (self.tverskaya.id, 1.6)])
+
+    def test_new_restaurant_gets_distance(self):
+        order = self.create_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_arbat = self.create_restaurant('Star Burger Новый Арбат', 'Москва, Новый Арбат 10')
+        self.run_jobs()
+
+        self.assertEqual(
+            self.get_candidates(order),
+            [(new_arbat.id, 0.4), (self.arbat.id, 1.4), (self.tverskaya.id, 1.6)],
+        )
+
+    @override_settings(ORDER_CANDIDATES_RADIUS_KM=0.1)
+    def test_all_able_restaurants_when_none_is_near(self):
+        order = self.create_order()
+
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6)])
+
+    def test_assigned_order_loses_candidates(self):
+        order = self.create_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.restaurant = self.arbat
+            order.save()
+        self.run_jobs()
+
+        self.assertEqual(self.get_candidates(order), [])
+
+    def test_new_item_leaves_restaurants_able_to_cook_it(self):
+        fries = Product.objects.create(name='Картофель фри', price=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.tverskaya, product=fries)
+        order = self.create_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            OrderItem.objects.create(order=order, product=fries, quantity=1, price=fries.price)
+        self.run_jobs()
+
+        self.assertEqual(self.get_candidates(order), [(self.tverskaya.id, 1.6)])
+
+    def test_menu_change_refreshes_candidates(self):
+        order = self.create_order()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.filter(restaurant=self.arbat, product=self.burger).get().delete()
+        self.run_jobs()
+        self.assertEqual(self.get_candidates(order), [(self.tverskaya.id, 1.6)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantMenuItem.objects.create(restaurant=self.arbat, product=self.burger)
+        self.run_jobs()
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6)])
+
+    def test_client_geocoded_later_gets_distances(self):
+        address = 'Москва, Красная площадь 1'
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.info.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address=address)
+            OrderItem.objects.create(order=order, product=self.burger, quantity=1, price=self.burger.price)
+        self.run_jobs()
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, None), (self.tverskaya.id, None)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            enqueue('places.geocode_address', address=address)
+        self.run_jobs()
+        self.assertEqual(self.get_candidates(order), [(self.arbat.id, 1.4), (self.tverskaya.id, 1.6)])
+
+
+class CacheBrokerTest(SimpleTestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.broker = CacheBroker(poll_interval=0.01)
+
+    def test_listen_returns_new_events(self):
+        last_event_id = self.broker.get_last_event_id()
+        self.broker.publish({'order': 1, 'type': 'created'})
+        self.broker.publish({'order': 1, 'type': 'updated'})
+
+        events = self.broker.listen(last_event_id, timeout=1)
+
+        self.assertEqual(
+            events,
+            [(last_event_id + 1, {'order': 1, 'type': 'created'}), (last_event_id + 2, {'order': 1, 'type': 'updated'})],
+        )
+
+    def test_listen_waits_past_expired_events(self):
+        last_event_id = self.broker.get_last_event_id()
+        self.broker.publish({'order': 1, 'type': 'created'})
+        caching.get_cache().delete(self.broker.event_key.format(event_id=last_event_id + 1))
+
+        started_at = time.monotonic()
+        events = self.broker.listen(last_event_id, timeout=0.2)
+
+        self.assertEqual(events, [])
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.2)
+
+
+def solve_assignment_brute_force(order_costs, capacities):
+    """Most orders assigned at the least cost, by trying every choice, for small inputs only."""
+    orders = list(order_costs)
+    best = (0, 0)
+    for choice in itertools.product(*[[None, *order_costs[order]] for order in orders]):
+        loads = {}
+        for restaurant in choice:
+            if restaurant is not None:
+                loads[restaurant] = loads.get(restaurant, 0) + 1
+        if any(load > capacities.get(restaurant, 0) for restaurant, load in loads.items()):
+            continue
+        cost = sum(order_costs[order][restaurant] for order, restaurant in zip(orders, choice) if restaurant is not None)
+        best = max(best, (sum(loads.values()), -cost))
+    return best
+
+
+class SolveAssignmentTest(SimpleTestCase):
+    def get_score(self, order_costs, capacities, assignments):
+        loads = {}
+        for restaurant in assignments.values():
+            loads[restaurant] = loads.get(restaurant, 0) + 1
+        for restaurant, load in loads.items():
+            self.assertLessEqual(load, capacities[restaurant])
+        return len(assignments), -sum(order_costs[order][restaurant] for order, restaurant in assignments.items())
+
+    def test_nearest_restaurant_is_taken_when_free(self):
+        assignments = solve_assignment({1: {'a': 5, 'b': 1}, 2: {'a': 2}}, {'a': 1, 'b': 1})
+
+        self.assertEqual(assignments, {1: 'b', 2: 'a'})
+
+    def test_order_gives_way_to_assign_more(self):
+        # Order 1 is nearer to a, but then order 2 would get nothing
+        assignments = solve_assignment({1: {'a': 1, 'b': 3}, 2: {'a': 2}}, {'a': 1, 'b': 1})
+
+        self.assertEqual(assignments, {1: 'b', 2: 'a'})
+
+    def test_full_restaurants_get_nothing(self):
+        assignments = solve_assignment({1: {'a': 1}, 2: {'a': 2}, 3: {'b': 1}}, {'a': 1, 'b': 0})
+
+        self.assertEqual(assignments, {1: 'a'})
+
+    def test_matches_brute_force(self):
+        generator = random.Random(23)
+        for _ in range(200):
+            restaurants = 'abc'[:generator.randint(1, 3)]
+            capacities = {restaurant: generator.randint(0, 2) for restaurant in restaurants}
+            order_costs = {
+                order: {
+                    restaurant: generator.randint(0, 20)
+                    for restaurant in generator.sample(restaurants, generator.randint(0, len(restaurants)))
+                }
+                for order in range(generator.randint(1, 5))
+            }
+
+            assignments = solve_assignment(order_costs, capacities)
+
+            self.assertEqual(
+                self.get_score(order_costs, capacities, assignments),
+                solve_assignment_brute_force(order_costs, capacities),
+                (order_costs, capacities),
+            )
@@ -1,20 +1,43 @@
-import datetime
-import logging.handlers
-from decimal import Decimal
+import asyncio
+import codecs
+import json
+import logging
+from collections import namedtuple
+from functools import wraps
 
+import httpx
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.db import IntegrityError
 from django.db.transaction import atomic
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
 from django.templatetags.static import static
-from rest_framework.decorators import api_view
+from django.utils.cache import patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from rest_framework import status
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
 
-from places.models import Place
-from places.views import fetch_coordinates, create_restaurant_places_if_not_exists
-from .models import Product
+from jobs.queue import enqueue
+from places.cache import get_place_async
+from places.geocoder import CircuitOpenError
+from star_burger import caching
+from star_burger.caching import cached
+from .catalog import catalog_etag, catalog_last_modified, get_products_payload
+from .idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, get_request_hash, get_stored_key, store_response
+from .importers import import_orders, read_csv, read_json_lines
+from .renderers import ApiJSONEncoder, choose_content_encoding, get_json_dumps_params
 from .serializers import OrderSerializer
 
+logger = logging.getLogger(__name__)
 
+
+@cached(caching.BANNERS, timeout=60 * 60, key_func=lambda request: ())
 def banners_list_api(request):
     # FIXME move data to db?
     return JsonResponse([
@@ -33,37 +56,20 @@ def banners_list_api(request):
             'src': static('tasty.jpg'),
             'text': 'Food is incomplete without a tasty dessert',
         }
-    ], safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    ], safe=False, encoder=ApiJSONEncoder, json_dumps_params=get_json_dumps_params())
 
 
+@cache_control(no_cache=True)
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
 def product_list_api(request):
-    products = Product.objects.select_related('category').available()
-    dumped_products = []
-    for product in products:
-        dumped_product = {
-            'id': product.id,
-            'name': product.name,
-            'price': product.price,
-            'special_status': product.special_status,
-            'description': product.description,
-            'category': {
-                'id': product.category.id,
-                'name': product.category.name,
-            } if product.category else None,
-            'image': product.image.url,
-            'restaurant': {
-                'id': product.id,
-                'name': product.name,
-            }
-        }
-        dumped_products.append(dumped_product)
-    return JsonResponse(dumped_products, safe=False, json_dumps_params={
-        'ensure_ascii': False,
-        'indent': 4,
-    })
+    encoding = choose_content_encoding(request)
+    response = HttpResponse(get_products_payload(encoding), content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+        # The compressed body differs byte to byte, so the ETag becomes weak as in GZipMiddleware
+        response['ETag'] = f'W/{quote_etag(catalog_etag(request))}'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
 
 
 # {"products":
@@ -75,30 +81,135 @@ def product_list_api(request):
 # "}
 
 
-@atomic()
+CheckoutResult = namedtuple('CheckoutResult', ['data', 'status', 'headers', 'order'], defaults=[None, None])
+
+
+def replay_order_response(stored_key, request_hash):
+    if stored_key.request_hash != request_hash:
+        return CheckoutResult(
+            {'Idempotency-Key': ['Ключ уже использован для другого заказа.']},
+            status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return CheckoutResult(stored_key.response, status.HTTP_200_OK, {'Idempotent-Replayed': 'true'})
+
+
+def place_order(data, idempotency_key=None, enqueue_geocoding=True):
+    """Validate and save the order, shared by the sync and async checkout views.
+
+    The order is returned only when it was created by this call, not on errors and replays.
+    """
+    # Retries of the checkout send the same key, they get the response of the first request
+    if idempotency_key:
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return CheckoutResult(
+                {'Idempotency-Key': [f'Ключ длиннее {IDEMPOTENCY_KEY_MAX_LENGTH} символов.']},
+                status.HTTP_400_BAD_REQUEST,
+            )
+        request_hash = get_request_hash(data)
+        stored_key = get_stored_key(idempotency_key)
+        if stored_key:
+            return replay_order_response(stored_key, request_hash)
+
+    # Deserializing order form
+    serializer = OrderSerializer(data=data)
+    if not serializer.is_valid():
+        return CheckoutResult(serializer.errors, status.HTTP_400_BAD_REQUEST)
+    try:
+        with atomic():
+            order = serializer.save()
+            # Serializing Order and return for frontend
+            response_data = OrderSerializer(order).data
+            if idempotency_key:
+                store_response(idempotency_key, request_hash, response_data)
+            if enqueue_geocoding:
+                # Coordinates are fetched by the job worker, the manager page shows them as pending until then
+                enqueue('places.geocode_address', address=order.address)
+    except IntegrityError:
+        # A concurrent request with the same key saved its order first
+        stored_key = idempotency_key and get_stored_key(idempotency_key)
+        if not stored_key:
+            raise
+        return replay_order_response(stored_key, request_hash)
+
+    return CheckoutResult(response_data, status.HTTP_200_OK, order=order)
+
+
 @api_view(['POST'])
 def register_order(request):
-    # Deserializing order form
-    serializer = OrderSerializer(data=request.data)
-    serializer.is_valid(raise_exception=True)
-    order = serializer.save()
-
-    place_coordinates = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, order.address)
-    if not place_coordinates:
-        place_coordinates = Decimal(0), Decimal(0)
-
-    place, created = Place.objects.get_or_create(
-        address=order.address,
-        defaults={
-            'longitude': place_coordinates[1],
-            'latitude': place_coordinates[0],
-            'last_request': datetime.date.today(),
-        }
+    result = place_order(request.data, request.headers.get('Idempotency-Key'))
+    return Response(result.data, status=result.status, headers=result.headers)
+
+
+def session_csrf_protect(view_func):
+    """CSRF handling of DRF views for async views, DRF 3.14 does not run them.
+
+    As with SessionAuthentication, only requests of logged in users need the token,
+    anonymous checkouts do not. Django 3.2 csrf_exempt turns coroutine functions into
+    sync ones, so the middleware check is switched off by the attribute it sets.
+    """
+    @wraps(view_func)
+    async def wrapped_view(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if is_authenticated:
+            try:
+                SessionAuthentication().enforce_csrf(request)
+            except PermissionDenied as error:
+                return JsonResponse({'detail': error.detail}, status=status.HTTP_403_FORBIDDEN)
+        return await view_func(request, *args, **kwargs)
+
+    wrapped_view.csrf_exempt = True
+    return wrapped_view
+
+
+@session_csrf_protect
+async def register_order_async(request):
+    """Checkout for ASGI servers, the geocoder is awaited right away without holding a worker thread."""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    try:
+        data = json.loads(request.body)
+    except ValueError as error:
+        result = CheckoutResult({'detail': f'JSON parse error - {error}'}, status.HTTP_400_BAD_REQUEST)
+    else:
+        result = await sync_to_async(place_order)(
+            data,
+            request.headers.get('Idempotency-Key'),
+            enqueue_geocoding=False,
+        )
+
+    if result.order:
+        try:
+            await asyncio.wait_for(get_place_async(result.order.address), settings.GEOCODER_CHECKOUT_TIMEOUT)
+        except Exception as error:
+            # The order is committed already, whatever fails here coordinates are left to the job worker
+            if not isinstance(error, (httpx.HTTPError, CircuitOpenError, asyncio.TimeoutError)):
+                logger.exception(f'Failed to geocode address of order {result.order.id}')
+            await sync_to_async(enqueue)('places.geocode_address', address=result.order.address)
+
+    response = JsonResponse(
+        result.data,
+        status=result.status,
+        safe=False,
+        encoder=ApiJSONEncoder,
+        json_dumps_params=get_json_dumps_params(),
     )
-    logging.DEBUG(f"Place {place} was created?{created}")
+    for header, value in (result.headers or {}).items():
+        response[header] = value
+    return response
 
-    create_restaurant_places_if_not_exists()
 
-    # Serializing Order and return for frontend
-    serializer = OrderSerializer(order)
-    return Response(serializer.data)
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def import_orders_api(request):
+    # Body is read line by line: JSON Lines by default or CSV with Content-Type text/csv
+    lines = codecs.iterdecode(request.stream or [], 'utf-8')
+    if request.content_type.startswith('text/csv'):
+        rows = read_csv(lines)
+    else:
+        rows = read_json_lines(lines)
+
+    created_count, errors = import_orders(rows)
+    return Response({
+        'created': created_count,
+        'errors': errors,
+    })
@@ -0,0 +1,42 @@
+import glob
+import os
+import sys
+
+from prometheus_client import multiprocess
+
+# The order board stream holds a connection for up to ORDER_EVENTS_STREAM_TIMEOUT seconds,
+# with threads it takes one thread of a worker instead of the whole worker.
+# At most ORDER_EVENTS_MAX_STREAMS threads of a worker go to streams, keep it below the threads.
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+
+def check_order_events_broker(server):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'star_burger.settings')
+    import django
+    django.setup()
+    from foodcartapp.events import is_broker_process_local
+
+    if server.cfg.workers > 1 and is_broker_process_local():
+        server.log.error(
+            'Order events would stay inside one of %s workers: set ORDER_EVENTS_BACKEND to '
+            'foodcartapp.events.CacheBroker and CACHE_URL to a cache shared by the workers',
+            server.cfg.workers,
+        )
+        sys.exit(1)
+
+
+def on_starting(server):
+    check_order_events_broker(server)
+
+    # Metrics files of the previous run would be added to the new counters
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
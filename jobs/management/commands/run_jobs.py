@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='выполнить все готовые задачи и выйти')
+        parser.add_argument('--batch', type=int, default=100, help='сколько задач забирать за раз')
+        parser.add_argument('--sleep', type=float, default=1.0, help='пауза между опросами пустой очереди, сек')
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        while True:
+            processed = backend.run_pending(limit=options['batch'])
+            if processed:
+                self.stdout.write(f'Обработано задач: {processed}')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
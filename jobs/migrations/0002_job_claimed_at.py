@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='задача, которую воркер не завершил за JOB_LEASE_SECONDS, возвращается в очередь', null=True, verbose_name='взята в работу'),
+        ),
+    ]
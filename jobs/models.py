@@ -0,0 +1,72 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(
+        'задача',
+        max_length=100,
+    )
+    kwargs = models.JSONField(
+        'аргументы',
+        default=dict,
+        blank=True,
+    )
+    status = models.CharField(
+        'статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField(
+        'попыток',
+        default=0,
+    )
+    max_attempts = models.PositiveIntegerField(
+        'максимум попыток',
+        default=5,
+    )
+    run_after = models.DateTimeField(
+        'запустить после',
+        default=timezone.now,
+    )
+    created_at = models.DateTimeField(
+        'создана',
+        default=timezone.now,
+    )
+    claimed_at = models.DateTimeField(
+        'взята в работу',
+        null=True,
+        blank=True,
+        help_text='задача, которую воркер не завершил за JOB_LEASE_SECONDS, возвращается в очередь',
+    )
+    finished_at = models.DateTimeField(
+        'завершена',
+        null=True,
+        blank=True,
+    )
+    last_error = models.TextField(
+        'последняя ошибка',
+        blank=True,
+    )
+
+    class Meta:
+        verbose_name = 'фоновая задача'
+        verbose_name_plural = 'фоновые задачи'
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.id}'
@@ -0,0 +1,128 @@
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def task(name):
+    def decorator(func):
+        registry[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+
+def run_task(name, kwargs):
+    return registry[name](**kwargs)
+
+
+class DatabaseBackend:
+    """Stores jobs in the `Job` table, they are executed by `manage.py run_jobs`.
+
+    The job row is written in the caller's transaction, so it is committed
+    (or rolled back) together with the data it refers to.
+    """
+
+    def enqueue(self, name, kwargs):
+        return Job.objects.create(name=name, kwargs=kwargs)
+
+    def claim(self, limit):
+        with transaction.atomic():
+            jobs = list(
+                Job.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=Job.PENDING, run_after__lte=timezone.now())
+                .order_by('run_after', 'id')[:limit]
+            )
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(status=Job.RUNNING, claimed_at=timezone.now())
+        return jobs
+
+    def requeue_lost(self):
+        """Return jobs of crashed workers to the queue, their lease expired while they were running.
+
+        The lost run counts as a failed attempt, so a job crashing every worker ends up failed.
+        """
+        now = timezone.now()
+        lost_jobs = Job.objects\
+            .filter(status=Job.RUNNING)\
+            .filter(Q(claimed_at__lt=now - timedelta(seconds=settings.JOB_LEASE_SECONDS)) | Q(claimed_at__isnull=True))
+        with transaction.atomic():
+            lost_jobs = list(lost_jobs.select_for_update(skip_locked=True))
+            for job in lost_jobs:
+                logger.warning(f'Job {job} lease expired, its worker is lost')
+                job.attempts += 1
+                job.last_error = 'Lease expired, the worker was lost'
+                if job.attempts >= job.max_attempts:
+                    job.status = Job.FAILED
+                    job.finished_at = now
+                else:
+                    job.status = Job.PENDING
+                    job.run_after = now
+            Job.objects.bulk_update(lost_jobs, ['attempts', 'last_error', 'status', 'finished_at', 'run_after'])
+        return len(lost_jobs)
+
+    def run(self, job):
+        job.attempts += 1
+        try:
+            run_task(job.name, job.kwargs)
+        except Exception as error:
+            logger.exception(f'Job {job} failed')
+            job.last_error = repr(error)
+            if job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                job.finished_at = timezone.now()
+            else:
+                job.status = Job.PENDING
+                job.run_after = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        else:
+            job.status = Job.DONE
+            job.finished_at = timezone.now()
+        job.save(update_fields=['attempts', 'status', 'run_after', 'finished_at', 'last_error'])
+
+    def run_pending(self, limit=100):
+        self.requeue_lost()
+        jobs = self.claim(limit)
+        for job in jobs:
+            self.run(job)
+        return len(jobs)
+
+
+class ImmediateBackend:
+    """Runs jobs in-process right after the surrounding transaction commits.
+
+    Failed jobs are logged and not retried, the caller's data is already committed.
+    """
+
+    def enqueue(self, name, kwargs):
+        transaction.on_commit(lambda: self.run(name, kwargs))
+
+    def run(self, name, kwargs):
+        try:
+            run_task(name, kwargs)
+        except Exception:
+            logger.exception(f'Job {name} failed')
+
+    def run_pending(self, limit=100):
+        return 0
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    return import_string(settings.JOB_QUEUE_BACKEND)()
+
+
+def enqueue(name, **kwargs):
+    if name not in registry:
+        raise KeyError(f'Unknown task {name}')
+    return get_backend().enqueue(name, kwargs)
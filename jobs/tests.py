@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job
+from .queue import DatabaseBackend, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.fail')
+def fail():
+    raise ValueError('broken')
+
+
+@override_settings(JOB_RETRY_DELAY=30, JOB_LEASE_SECONDS=60)
+class DatabaseBackendTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.backend = DatabaseBackend()
+
+    def test_claim_takes_due_pending_jobs(self):
+        due_job = self.backend.enqueue('jobs.tests.record', {'value': 1})
+        Job.objects.create(name='jobs.tests.record', run_after=timezone.now() + timedelta(hours=1))
+        Job.objects.create(name='jobs.tests.record', status=Job.DONE)
+
+        claimed_jobs = self.backend.claim(limit=10)
+
+        self.assertEqual(claimed_jobs, [due_job])
+        due_job.refresh_from_db()
+        self.assertEqual(due_job.status, Job.RUNNING)
+        self.assertIsNotNone(due_job.claimed_at)
+        self.assertEqual(self.backend.claim(limit=10), [])
+
+    def test_claim_respects_limit_and_order(self):
+        jobs = [self.backend.enqueue('jobs.tests.record', {'value': value}) for value in range(3)]
+
+        self.assertEqual(self.backend.claim(limit=2), jobs[:2])
+        self.assertEqual(self.backend.claim(limit=2), jobs[2:])
+
+    def test_run_pending_runs_jobs(self):
+        job = self.backend.enqueue('jobs.tests.record', {'value': 1})
+
+        self.assertEqual(self.backend.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertEqual(calls, [1])
+
+    def test_failed_job_is_retried_later(self):
+        job = self.backend.enqueue('jobs.tests.fail', {})
+
+        self.backend.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=20))
+        self.assertIn('broken', job.last_error)
+        self.assertEqual(self.backend.run_pending(), 0)
+
+    def test_job_fails_after_max_attempts(self):
+        job = Job.objects.create(name='jobs.tests.fail', attempts=4, max_attempts=5)
+
+        self.backend.run_pending()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_lost_job_is_requeued_after_lease(self):
+        lost_job = Job.objects.create(
+            name='jobs.tests.record',
+            kwargs={'value': 1},
+            status=Job.RUNNING,
+            claimed_at=timezone.now() - timedelta(seconds=61),
+        )
+        running_job = Job.objects.create(name='jobs.tests.record', status=Job.RUNNING, claimed_at=timezone.now())
+
+        self.assertEqual(self.backend.run_pending(), 1)
+
+        lost_job.refresh_from_db()
+        self.assertEqual((lost_job.status, lost_job.attempts), (Job.DONE, 2))
+        running_job.refresh_from_db()
+        self.assertEqual(running_job.status, Job.RUNNING)
+        self.assertEqual(calls, [1])
+
+    def test_job_losing_every_worker_fails(self):
+        job = Job.objects.create(
+            name='jobs.tests.record',
+            status=Job.RUNNING,
+            attempts=4,
+            max_attempts=5,
+            claimed_at=timezone.now() - timedelta(seconds=61),
+        )
+
+        self.assertEqual(self.backend.requeue_lost(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('Lease expired', job.last_error)
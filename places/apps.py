@@ -1,6 +1,9 @@
-from django.apps import AppConfig
-
-
-class PlacesConfig(AppConfig):
-    default_auto_field = 'django.db.models.BigAutoField'
-    name = 'places'
+from django.apps import AppConfig
+
+
+class PlacesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'places'
+
+    def ready(self):
+        from . import signals  # noqa: F401
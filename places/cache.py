@@ -0,0 +1,156 @@
+import datetime
+import logging
+import threading
+from contextlib import contextmanager
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from star_burger import caching
+from star_burger.db_router import read_from_primary
+from .geocoder import CircuitOpenError, get_geocoder
+from .models import Place
+
+logger = logging.getLogger(__name__)
+
+COORDINATES_CACHE_TIMEOUT = 60 * 60 * 24
+
+_address_locks = {}
+_address_locks_guard = threading.Lock()
+
+
+def normalize_address(address):
+    return ' '.join(address.split()).lower()
+
+
+def is_fresh(place, today=None):
+    if not place.last_request:
+        return False
+    today = today or datetime.date.today()
+    if place.is_found:
+        ttl = settings.GEOCODER_CACHE_TTL_DAYS
+    else:
+        ttl = settings.GEOCODER_NOT_FOUND_TTL_DAYS
+    return today - place.last_request < datetime.timedelta(days=ttl)
+
+
+@contextmanager
+def address_lock(address):
+    """Lets only one thread of the process geocode an address at a time."""
+    with _address_locks_guard:
+        lock, waiters = _address_locks.get(address, (threading.Lock(), 0))
+        _address_locks[address] = lock, waiters + 1
+    try:
+        with lock:
+            yield
+    finally:
+        with _address_locks_guard:
+            lock, waiters = _address_locks[address]
+            if waiters > 1:
+                _address_locks[address] = lock, waiters - 1
+            else:
+                del _address_locks[address]
+
+
+def get_place(address):
+    """Return the cached place for the address, asking the geocoder only on a miss or a stale entry.
+
+    "Not found" answers are cached too, as a place without coordinates.
+    """
+    address = normalize_address(address)
+    place = Place.objects.filter(address=address).first()
+    if place and is_fresh(place):
+        return place
+
+    with address_lock(address):
+        # Concurrent lookup of the same address could have already filled the cache
+        place = Place.objects.filter(address=address).first()
+        if place and is_fresh(place):
+            return place
+
+        try:
+            coordinates = get_geocoder().fetch_coordinates(address)
+        except requests.RequestException:
+            if not place:
+                raise
+            logger.warning(f'Geocoder is unavailable, using stale coordinates of {address}')
+            return place
+
+        return save_place(address, coordinates)
+
+
+def save_place(address, coordinates):
+    longitude, latitude = coordinates or (None, None)
+    place, _ = Place.objects.update_or_create(
+        address=address,
+        defaults={
+            'longitude': longitude,
+            'latitude': latitude,
+            'last_request': datetime.date.today(),
+        }
+    )
+    return place
+
+
+async def get_place_async(address):
+    """Same as get_place, but the geocoder is awaited instead of blocking a thread.
+
+    Concurrent lookups of the address are not coalesced, the database is used from a thread.
+    """
+    address = normalize_address(address)
+    place = await sync_to_async(Place.objects.filter(address=address).first)()
+    if place and is_fresh(place):
+        return place
+
+    try:
+        coordinates = await get_geocoder().fetch_coordinates_async(address)
+    except (httpx.HTTPError, CircuitOpenError):
+        if not place:
+            raise
+        logger.warning(f'Geocoder is unavailable, using stale coordinates of {address}')
+        return place
+
+    return await sync_to_async(save_place)(address, coordinates)
+
+
+def get_coordinates(addresses):
+    """Load cached coordinates of the addresses, querying the database only for cache misses.
+
+    Maps a normalized address to a (latitude, longitude) pair, or to None if the
+    geocoder could not find it. Addresses which were not geocoded yet are absent.
+    """
+    addresses = {normalize_address(address) for address in addresses}
+    cache = caching.get_cache()
+    version = caching.get_namespace_version(caching.PLACES)
+    cache_keys = {
+        caching.make_key(caching.PLACES, 'coordinates', address, version=version): address
+        for address in addresses
+    }
+    # Stored as (None, None) for not found addresses, some backends drop None values from get_many
+    cached_coordinates = {cache_keys[key]: value for key, value in cache.get_many(cache_keys).items()}
+
+    missing_addresses = addresses - cached_coordinates.keys()
+    if missing_addresses:
+        # Cached for a day, so a lagging replica must not be read
+        with read_from_primary():
+            places = Place.objects.filter(address__in=missing_addresses).values_list('address', 'latitude', 'longitude')
+            loaded_coordinates = {address: (latitude, longitude) for address, latitude, longitude in places}
+        cache.set_many(
+            {
+                caching.make_key(caching.PLACES, 'coordinates', address, version=version): value
+                for address, value in loaded_coordinates.items()
+            },
+            COORDINATES_CACHE_TIMEOUT,
+        )
+        cached_coordinates.update(loaded_coordinates)
+
+    return {
+        address: (latitude, longitude) if latitude is not None and longitude is not None else None
+        for address, (latitude, longitude) in cached_coordinates.items()
+    }
+
+
+def forget_coordinates(address):
+    caching.delete(caching.PLACES, 'coordinates', address)
@@ -0,0 +1,47 @@
+import numpy as np
+from django.conf import settings
+from geopy import distance
+
+EARTH_RADIUS_KM = 6371.0088
+
+HAVERSINE = 'haversine'
+GEODESIC = 'geodesic'
+
+
+def haversine_matrix(origins, destinations):
+    """Great-circle distances in km between every origin and destination.
+
+    Points are (latitude, longitude) pairs, the result has a row per origin.
+    """
+    origins = np.radians(np.asarray(origins, dtype=float).reshape(-1, 2))
+    destinations = np.radians(np.asarray(destinations, dtype=float).reshape(-1, 2))
+
+    origin_latitudes = origins[:, 0, np.newaxis]
+    origin_longitudes = origins[:, 1, np.newaxis]
+    destination_latitudes = destinations[:, 0]
+    destination_longitudes = destinations[:, 1]
+
+    a = (
+        np.sin((destination_latitudes - origin_latitudes) / 2) ** 2
+        + np.cos(origin_latitudes) * np.cos(destination_latitudes)
+        * np.sin((destination_longitudes - origin_longitudes) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def geodesic_matrix(origins, destinations):
+    """Exact distances on the WGS-84 ellipsoid, one geopy call per pair."""
+    matrix = np.empty((len(origins), len(destinations)))
+    for row, origin in enumerate(origins):
+        for column, destination in enumerate(destinations):
+            matrix[row, column] = distance.distance(origin, destination).km
+    return matrix
+
+
+def distance_matrix(origins, destinations, mode=None):
+    mode = mode or settings.DISTANCE_MODE
+    if mode == HAVERSINE:
+        return haversine_matrix(origins, destinations)
+    if mode == GEODESIC:
+        return geodesic_matrix(origins, destinations)
+    raise ValueError(f'Unknown distance mode {mode}')
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from star_burger import metrics
+
+GEOCODER_URL = "https://geocode-maps.yandex.ru/1.x"
+RETRY_STATUSES = [500, 502, 503, 504]
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """The geocoder failed too often recently, it is not asked until the circuit resets."""
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` failures in a row, then lets a single trial request through every `reset_timeout` seconds."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            # Half-open: this request is the trial, the others keep failing fast until it finishes
+            self.opened_at = time.monotonic()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def parse_coordinates(response_data):
+    found_places = response_data['response']['GeoObjectCollection']['featureMember']
+
+    if not found_places:
+        return None
+
+    most_relevant = found_places[0]
+    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
+    return lon, lat
+
+
+def is_upstream_failure(error):
+    # 4xx answers mean a bad request or API key, the geocoder itself is fine
+    response = getattr(error, 'response', None)
+    return response is None or response.status_code >= 500
+
+
+class GeocoderClient:
+    """Yandex geocoder client with a keep-alive connection pool, timeouts, retries and a circuit breaker.
+
+    Sync lookups share one pooled session, async ones the httpx client opened on ASGI startup.
+    Both count requests, errors and latency in `stats`.
+    """
+
+    def __init__(self, apikey, base_url=GEOCODER_URL, timeout=5, retries=2, retry_backoff=0.5,
+                 pool_size=10, breaker=None):
+        self.apikey = apikey
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=['GET'],
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.async_client = None
+        self.async_client_loop = None
+
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'requests': 0,
+            'errors': 0,
+            'rejected': 0,
+            'latency_seconds_total': 0.0,
+            'latency_seconds_max': 0.0,
+        }
+
+    def get_params(self, address):
+        return {
+            "geocode": address,
+            "apikey": self.apikey,
+            "format": "json",
+        }
+
+    def get_stats(self):
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats['circuit_open'] = self.breaker.is_open
+        return stats
+
+    def start_request(self):
+        if not self.breaker.allow_request():
+            with self.stats_lock:
+                self.stats['rejected'] += 1
+            metrics.GEOCODER_REQUESTS.labels('rejected').inc()
+            raise CircuitOpenError(f'Geocoder circuit is open for {self.breaker.reset_timeout} s')
+        return time.monotonic()
+
+    def finish_request(self, started_at, error=None):
+        latency = time.monotonic() - started_at
+        with self.stats_lock:
+            self.stats['requests'] += 1
+            self.stats['latency_seconds_total'] += latency
+            self.stats['latency_seconds_max'] = max(self.stats['latency_seconds_max'], latency)
+            if error:
+                self.stats['errors'] += 1
+        metrics.GEOCODER_REQUESTS.labels('error' if error else 'ok').inc()
+        metrics.GEOCODER_DURATION.observe(latency)
+        if error and is_upstream_failure(error):
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def fetch_coordinates(self, address):
+        """Return (longitude, latitude) of the address or None if it is not found."""
+        started_at = self.start_request()
+        try:
+            response = self.session.get(self.base_url, params=self.get_params(address), timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException as error:
+            self.finish_request(started_at, error)
+            raise
+        self.finish_request(started_at)
+        return parse_coordinates(response.json())
+
+    def make_async_client(self):
+        return httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_keepalive_connections=self.pool_size),
+        )
+
+    async def start_async(self):
+        """Open the client shared by requests of the process, on ASGI lifespan startup."""
+        if self.async_client is None:
+            self.async_client = self.make_async_client()
+            self.async_client_loop = asyncio.get_running_loop()
+
+    async def aclose(self):
+        """Close the shared client and its connections, on ASGI lifespan shutdown."""
+        client, self.async_client, self.async_client_loop = self.async_client, None, None
+        if client is not None:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def get_async_client(self):
+        # httpx clients are bound to an event loop. Without the ASGI lifespan, e.g. async views
+        # under WSGI running a loop per request, a client is opened and closed for the request.
+        if self.async_client is not None and self.async_client_loop is asyncio.get_running_loop():
+            yield self.async_client
+            return
+        async with self.make_async_client() as client:
+            yield client
+
+    async def fetch_coordinates_async(self, address):
+        """Same as fetch_coordinates, without blocking the event loop."""
+        started_at = self.start_request()
+        error = None
+        try:
+            async with self.get_async_client() as client:
+                for attempt in range(self.retries + 1):
+                    try:
+                        response = await client.get(self.base_url, params=self.get_params(address))
+                        response.raise_for_status()
+                        break
+                    except httpx.HTTPError as attempt_error:
+                        retryable = isinstance(attempt_error, httpx.TransportError) or (
+                            isinstance(attempt_error, httpx.HTTPStatusError)
+                            and attempt_error.response.status_code in RETRY_STATUSES
+                        )
+                        if attempt == self.retries or not retryable:
+                            raise
+                        await asyncio.sleep(self.retry_backoff * 2 ** attempt)
+        except BaseException as request_error:
+            # Cancelled requests too, e.g. by the checkout timeout, otherwise a half-open circuit would never close
+            error = request_error
+            raise
+        finally:
+            self.finish_request(started_at, error)
+        return parse_coordinates(response.json())
+
+
+@lru_cache(maxsize=None)
+def get_geocoder():
+    return GeocoderClient(
+        settings.YANDEX_GEOCODER_API_KEY,
+        base_url=settings.GEOCODER_URL,
+        timeout=settings.GEOCODER_TIMEOUT,
+        retries=settings.GEOCODER_RETRIES,
+        retry_backoff=settings.GEOCODER_RETRY_BACKOFF,
+        pool_size=settings.GEOCODER_MAX_WORKERS,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.GEOCODER_CIRCUIT_FAILURES,
+            reset_timeout=settings.GEOCODER_CIRCUIT_RESET_TIMEOUT,
+        ),
+    )
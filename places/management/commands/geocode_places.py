@@ -0,0 +1,177 @@
+import datetime
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodcartapp.models import Order, Restaurant
+from jobs.queue import enqueue
+from places.cache import is_fresh, normalize_address
+from places.geocoder import CircuitOpenError, get_geocoder
+from places.models import Place
+from star_burger import caching
+
+
+class RateLimiter:
+    """Spaces out calls from all threads to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            call_at = max(self.next_call, now)
+            self.next_call = call_at + self.interval
+        time.sleep(call_at - now)
+
+
+def read_checkpoint(path):
+    """The last processed address and the addresses which failed up to it, to try them again."""
+    if not path or not os.path.exists(path):
+        return None, []
+    with open(path, encoding='utf-8') as file:
+        checkpoint = json.load(file)
+    return checkpoint['after'], checkpoint.get('failed', [])
+
+
+def write_checkpoint(path, address, failed_addresses):
+    if not path:
+        return
+    # Written aside and renamed, so an interrupted run never leaves a broken checkpoint
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as file:
+        json.dump({'after': address, 'failed': sorted(failed_addresses)}, file, ensure_ascii=False)
+    os.replace(f'{path}.tmp', path)
+
+
+def get_addresses_to_geocode(days=None, after=None, failed_addresses=()):
+    """Sorted normalized addresses of orders and restaurants without fresh coordinates.
+
+    Only the addresses after `after` are returned, and the failed ones before it.
+    """
+    addresses = set()
+    for model in [Order.info, Restaurant.objects]:
+        addresses |= {
+            normalize_address(address)
+            for address in model.exclude(address='').values_list('address', flat=True).distinct().iterator()
+        }
+    if after is not None:
+        failed_addresses = set(failed_addresses)
+        addresses = {address for address in addresses if address > after or address in failed_addresses}
+
+    today = datetime.date.today()
+    fresh_addresses = set()
+    places = Place.objects.filter(last_request__isnull=False).only('address', 'latitude', 'longitude', 'last_request')
+    for place in places.iterator():
+        if place.address not in addresses or not is_fresh(place, today):
+            continue
+        if days is not None and today - place.last_request >= datetime.timedelta(days=days):
+            continue
+        fresh_addresses.add(place.address)
+    return sorted(addresses - fresh_addresses)
+
+
+def save_places(geocoded_places):
+    """Write (address, coordinates) pairs back with bulk queries."""
+    today = datetime.date.today()
+    existing_places = Place.objects.in_bulk([address for address, _ in geocoded_places], field_name='address')
+    updated_places = []
+    new_places = []
+    for address, coordinates in geocoded_places:
+        longitude, latitude = coordinates or (None, None)
+        place = existing_places.get(address) or Place(address=address)
+        place.longitude, place.latitude, place.last_request = longitude, latitude, today
+        place.update_geohash()
+        if place.pk:
+            updated_places.append(place)
+        else:
+            new_places.append(place)
+    Place.objects.bulk_update(updated_places, ['longitude', 'latitude', 'geohash', 'last_request'])
+    Place.objects.bulk_create(new_places, ignore_conflicts=True)
+    # Bulk queries send no signals, so cached coordinates are dropped here
+    transaction.on_commit(lambda: caching.invalidate(caching.PLACES))
+
+
+class Command(BaseCommand):
+    help = 'Находит адреса заказов и ресторанов без свежих координат и запрашивает их у геокодера'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='обновить и координаты, полученные больше стольких дней назад, по умолчанию по GEOCODER_CACHE_TTL_DAYS',
+        )
+        parser.add_argument('--workers', type=int, default=settings.GEOCODER_MAX_WORKERS, help='сколько запросов к геокодеру выполнять одновременно')
+        parser.add_argument('--rate', type=float, default=10, help='не больше стольких запросов к геокодеру в секунду')
+        parser.add_argument('--batch-size', type=int, default=100, help='сколько адресов сохранять за раз')
+        parser.add_argument(
+            '--checkpoint',
+            help='файл, где запоминать последний обработанный адрес и адреса с ошибками, чтобы продолжить после остановки',
+        )
+        parser.add_argument('--restart', action='store_true', help='начать сначала, не читая файл --checkpoint')
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        after, failed_addresses = (None, []) if options['restart'] else read_checkpoint(checkpoint)
+        failed_addresses = set(failed_addresses)
+        addresses = get_addresses_to_geocode(options['days'], after, failed_addresses)
+        self.stdout.write(f'Адресов для геокодирования: {len(addresses)}')
+
+        geocoder = get_geocoder()
+        rate_limiter = RateLimiter(options['rate'])
+
+        def geocode(address):
+            rate_limiter.wait()
+            try:
+                return geocoder.fetch_coordinates(address)
+            except requests.RequestException as error:
+                return error
+
+        geocoded_count = 0
+        failed_count = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for batch_start in range(0, len(addresses), options['batch_size']):
+                batch = addresses[batch_start:batch_start + options['batch_size']]
+                results = list(executor.map(geocode, batch))
+
+                # The checkpoint stops before the first address rejected by the open circuit
+                stopped_at = next(
+                    (index for index, result in enumerate(results) if isinstance(result, CircuitOpenError)),
+                    None,
+                )
+                processed = list(zip(batch, results))[:stopped_at]
+                geocoded_places = [
+                    (address, result) for address, result in processed if not isinstance(result, Exception)
+                ]
+                save_places(geocoded_places)
+                geocoded_count += len(geocoded_places)
+                failed_count += len(processed) - len(geocoded_places)
+                for address, result in processed:
+                    if isinstance(result, Exception):
+                        self.stderr.write(f'{address}: {result!r}')
+                        failed_addresses.add(address)
+                    else:
+                        failed_addresses.discard(address)
+                if processed:
+                    # Failed addresses of earlier runs come first, they must not move the checkpoint back
+                    after = max(after or '', processed[-1][0])
+                    write_checkpoint(checkpoint, after, failed_addresses)
+
+                if stopped_at is not None:
+                    raise CommandError(
+                        f'Геокодер недоступен, остановлено. Получено координат: {geocoded_count}, ошибок: {failed_count}'
+                    )
+                self.stdout.write(f'Обработано адресов: {batch_start + len(batch)} из {len(addresses)}')
+
+        if geocoded_count:
+            # Places are saved in bulk without signals, so distances of orders are refreshed here
+            enqueue('foodcartapp.refresh_order_candidates')
+        self.stdout.write(f'Получено координат: {geocoded_count}, ошибок: {failed_count}')
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:07
+
+from django.db import migrations, models
+
+
+def fix_places(apps, schema_editor):
+    # Coordinates used to be stored swapped and (0, 0) meant "not found or failed".
+    # Addresses are stored normalized by places.cache.normalize_address from now on.
+    Place = apps.get_model('places', 'Place')
+    kept_places = {}
+    for place in Place.objects.order_by('-last_request', 'id'):
+        address = ' '.join(place.address.split()).lower()
+        if address in kept_places:
+            place.delete()
+        else:
+            kept_places[address] = place
+
+    for address, place in kept_places.items():
+        place.address = address
+        if place.latitude == 0 and place.longitude == 0:
+            place.latitude, place.longitude, place.last_request = None, None, None
+        else:
+            place.latitude, place.longitude = place.longitude, place.latitude
+        place.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0003_auto_20241001_2113'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='place',
+            name='latitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='широта'),
+        ),
+        migrations.AlterField(
+            model_name='place',
+            name='longitude',
+            field=models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True, verbose_name='долгота'),
+        ),
+        migrations.RunPython(fix_places, migrations.RunPython.noop),
+    ]
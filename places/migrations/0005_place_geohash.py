@@ -0,0 +1,56 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:31
+
+from django.db import migrations, models
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+
+
+def encode_geohash(latitude, longitude):
+    # Copy of places.spatial.encode_geohash as of this migration, the module may change later
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    is_longitude_bit = True
+    while len(geohash) < GEOHASH_PRECISION:
+        value, value_range = (float(longitude), longitude_range) if is_longitude_bit else (float(latitude), latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        is_longitude_bit = not is_longitude_bit
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+
+def fill_geohashes(apps, schema_editor):
+    Place = apps.get_model('places', 'Place')
+    places = Place.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    for place in places:
+        place.geohash = encode_geohash(place.latitude, place.longitude)
+    Place.objects.bulk_update(places, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('places', '0004_nullable_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='place',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, help_text='ячейка координат, по префиксу ищутся ближайшие места', max_length=12, verbose_name='геохеш'),
+        ),
+        migrations.RunPython(fill_geohashes, migrations.RunPython.noop),
+    ]
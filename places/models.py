@@ -1,5 +1,7 @@
 from django.db import models
 
+from .spatial import encode_geohash
+
 
 class Place(models.Model):
     address = models.TextField(
@@ -11,16 +13,27 @@ class Place(models.Model):
         'долгота',
         max_digits=9,
         decimal_places=6,
+        null=True,
+        blank=True,
     )
     latitude = models.DecimalField(
         'широта',
         max_digits=9,
         decimal_places=6,
+        null=True,
+        blank=True,
     )
     last_request = models.DateField(
         'дата последнего запроса к геокодеру',
         null=True,
     )
+    geohash = models.CharField(
+        'геохеш',
+        max_length=12,
+        blank=True,
+        db_index=True,
+        help_text='ячейка координат, по префиксу ищутся ближайшие места',
+    )
 
     class Meta:
         verbose_name = 'место'
@@ -28,3 +41,15 @@ class Place(models.Model):
 
     def __str__(self):
         return f'{self.address}'
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        super().save(*args, **kwargs)
+
+    def update_geohash(self):
+        # Bulk queries skip save(), they have to call it themselves
+        self.geohash = encode_geohash(self.latitude, self.longitude) if self.is_found else ''
+
+    @property
+    def is_found(self):
+        return self.latitude is not None and self.longitude is not None
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodcartapp.models import Restaurant
+from jobs.queue import enqueue
+from .cache import forget_coordinates
+from .models import Place
+
+
+@receiver(post_save, sender=Restaurant)
+def geocode_restaurant_address(sender, instance, **kwargs):
+    if instance.address:
+        enqueue('places.geocode_restaurants')
+
+
+@receiver([post_save, post_delete], sender=Place)
+def invalidate_place_coordinates(sender, instance, **kwargs):
+    # Forgotten before the commit, a concurrent reader could cache the old coordinates again
+    transaction.on_commit(lambda: forget_coordinates(instance.address))
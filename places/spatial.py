@@ -0,0 +1,119 @@
+import math
+
+from .distance import EARTH_RADIUS_KM, distance_matrix
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored in Place.geohash, a cell of about 5 x 5 m
+GEOHASH_PRECISION = 9
+# Cells of the in-memory index, about 39 x 20 km
+BUCKET_PRECISION = 4
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    latitude_range = [-90.0, 90.0]
+    longitude_range = [-180.0, 180.0]
+    geohash = []
+    bits = 0
+    bit_count = 0
+    is_longitude_bit = True
+    while len(geohash) < precision:
+        value, value_range = (float(longitude), longitude_range) if is_longitude_bit else (float(latitude), latitude_range)
+        middle = (value_range[0] + value_range[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            value_range[0] = middle
+        else:
+            value_range[1] = middle
+        is_longitude_bit = not is_longitude_bit
+        bit_count += 1
+        if bit_count == 5:
+            geohash.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(geohash)
+
+
+def get_cell_size(precision):
+    """Height and width of a geohash cell in degrees, longitude gets the odd bit."""
+    latitude_bits = precision * 5 // 2
+    longitude_bits = precision * 5 - latitude_bits
+    return 180 / 2 ** latitude_bits, 360 / 2 ** longitude_bits
+
+
+def get_covering_cells(latitude, longitude, radius_km, precision=BUCKET_PRECISION, max_cells=None):
+    """Geohash cells covering the bounding box of the circle around the point.
+
+    Returns None if there would be more than max_cells of them.
+    """
+    latitude, longitude = float(latitude), float(longitude)
+    cell_height, cell_width = get_cell_size(precision)
+    latitude_delta = radius_km / KM_PER_DEGREE
+    min_latitude, max_latitude = max(latitude - latitude_delta, -90), min(latitude + latitude_delta, 90)
+    # Degrees of longitude shrink towards the poles, so the circle is widest at its poleward side
+    poleward_latitude = max(abs(min_latitude), abs(max_latitude))
+    if poleward_latitude >= 90:
+        longitude_delta = 180
+    else:
+        longitude_delta = min(latitude_delta / math.cos(math.radians(poleward_latitude)), 180)
+
+    min_longitude, max_longitude = longitude - longitude_delta, longitude + longitude_delta
+    latitude_steps = min(int((max_latitude - min_latitude) / cell_height) + 2, int(180 / cell_height) + 1)
+    longitude_steps = min(int((max_longitude - min_longitude) / cell_width) + 2, int(360 / cell_width) + 1)
+    if max_cells is not None and latitude_steps * longitude_steps > max_cells:
+        return None
+
+    cells = set()
+    for latitude_step in range(latitude_steps):
+        cell_latitude = min(min_latitude + latitude_step * cell_height, max_latitude)
+        for longitude_step in range(longitude_steps):
+            cell_longitude = min(min_longitude + longitude_step * cell_width, max_longitude)
+            cell_longitude = (cell_longitude + 180) % 360 - 180
+            cells.add(encode_geohash(cell_latitude, cell_longitude, precision))
+    return cells
+
+
+class GridIndex:
+    """Points bucketed by geohash cells, a nearest search looks only into cells around the point.
+
+    Points are (key, latitude, longitude, geohash) tuples.
+    """
+
+    def __init__(self, points, precision=BUCKET_PRECISION):
+        self.precision = precision
+        self.buckets = {}
+        for key, latitude, longitude, geohash in points:
+            cell = (geohash or encode_geohash(latitude, longitude))[:precision]
+            self.buckets.setdefault(cell, []).append((key, float(latitude), float(longitude)))
+
+    def nearest(self, latitude, longitude, k, radius_km, keys=None):
+        """Up to k (key, distance in km) pairs within the radius, nearest first.
+
+        If keys are given, only their points are looked at. No radius means any distance.
+        """
+        # A wide circle covers more cells than there are filled ones, so every bucket is looked into instead
+        cells = None
+        if radius_km is not None:
+            cells = get_covering_cells(latitude, longitude, radius_km, self.precision, max_cells=len(self.buckets))
+        if cells is None:
+            cells = self.buckets.keys()
+        points = [
+            point
+            for cell in cells
+            for point in self.buckets.get(cell, ())
+            if keys is None or point[0] in keys
+        ]
+        if not points:
+            return []
+        distances = distance_matrix(
+            [(float(latitude), float(longitude))],
+            [(point_latitude, point_longitude) for _, point_latitude, point_longitude in points],
+        )[0]
+        found = sorted(
+            (float(point_distance), point[0])
+            for point, point_distance in zip(points, distances)
+            if radius_km is None or point_distance <= radius_km
+        )
+        return [(key, point_distance) for point_distance, key in found[:k]]
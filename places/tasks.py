@@ -0,0 +1,19 @@
+from jobs.queue import task
+from .cache import get_place
+from .views import create_restaurant_places_if_not_exists
+
+
+@task('places.geocode_address')
+def geocode_address(address):
+    get_place(address)
+
+
+@task('places.geocode_restaurants')
+def geocode_restaurants():
+    create_restaurant_places_if_not_exists()
+
+
+@task('places.geocode_addresses')
+def geocode_addresses(addresses):
+    for address in addresses:
+        get_place(address)
@@ -1,3 +1,277 @@
-from django.test import TestCase
-
-# Create your tests here.
+import asyncio
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from star_burger import caching
+from .cache import get_coordinates, get_place_async
+from .geocoder import CircuitBreaker, CircuitOpenError, GeocoderClient, get_geocoder
+from .distance import EARTH_RADIUS_KM, distance_matrix
+from .models import Place
+from .spatial import BUCKET_PRECISION, GridIndex, encode_geohash, get_covering_cells
+
+FOUND_RESPONSE = {
+    'response': {
+        'GeoObjectCollection': {
+            'featureMember': [{'GeoObject': {'Point': {'pos': '37.617635 55.755814'}}}],
+        },
+    },
+}
+
+
+class StubGeocoderHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.request_count += 1
+        status, delay = server.answers.pop(0) if server.answers else server.default_answer
+        time.sleep(delay)
+        body = json.dumps(FOUND_RESPONSE).encode() if status == 200 else b'{}'
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except ConnectionError:
+            # The client stopped waiting, as in the cancellation test
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubGeocoderMixin:
+    """A local HTTP server answering geocoder requests with the queued (status, delay) pairs."""
+
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubGeocoderHandler)
+        self.server.daemon_threads = True
+        self.server.request_count = 0
+        self.server.answers = []
+        self.server.default_answer = 200, 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/1.x'
+
+    def make_client(self, retries=2, failure_threshold=5, timeout=5):
+        return GeocoderClient(
+            'key',
+            base_url=self.url,
+            timeout=timeout,
+            retries=retries,
+            retry_backoff=0,
+            breaker=CircuitBreaker(failure_threshold=failure_threshold, reset_timeout=60),
+        )
+
+
+class GeocoderClientTest(StubGeocoderMixin, SimpleTestCase):
+    def test_retries_server_errors(self):
+        self.server.answers = [(503, 0), (502, 0)]
+        client = self.make_client()
+
+        coordinates = asyncio.run(client.fetch_coordinates_async('Москва'))
+
+        self.assertEqual(coordinates, ('37.617635', '55.755814'))
+        self.assertEqual(self.server.request_count, 3)
+        self.assertEqual(client.get_stats()['errors'], 0)
+
+    def test_does_not_retry_client_errors(self):
+        self.server.answers = [(403, 0)]
+        client = self.make_client()
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            asyncio.run(client.fetch_coordinates_async('Москва'))
+
+        self.assertEqual(self.server.request_count, 1)
+        self.assertFalse(client.breaker.is_open)
+
+    def test_circuit_opens_after_failures(self):
+        self.server.default_answer = 500, 0
+        client = self.make_client(retries=0, failure_threshold=2)
+
+        for _ in range(2):
+            with self.assertRaises(httpx.HTTPStatusError):
+                asyncio.run(client.fetch_coordinates_async('Москва'))
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(client.fetch_coordinates_async('Москва'))
+
+        self.assertEqual(self.server.request_count, 2)
+        self.assertEqual(client.get_stats()['rejected'], 1)
+
+    def test_cancelled_request_is_counted(self):
+        self.server.default_answer = 200, 1
+        client = self.make_client(retries=0, failure_threshold=1)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(asyncio.wait_for(client.fetch_coordinates_async('Москва'), 0.1))
+
+        stats = client.get_stats()
+        self.assertEqual((stats['requests'], stats['errors']), (1, 1))
+        self.assertTrue(stats['circuit_open'])
+
+
+class GetPlaceAsyncTest(StubGeocoderMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(GEOCODER_URL=self.url, GEOCODER_RETRIES=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        get_geocoder.cache_clear()
+        self.addCleanup(get_geocoder.cache_clear)
+
+    async def test_stale_place_is_used_when_geocoder_fails(self):
+        stale_place = await sync_to_async(Place.objects.create)(
+            address='москва',
+            latitude='55.7',
+            longitude='37.6',
+            last_request=datetime.date.today() - datetime.timedelta(days=365),
+        )
+        self.server.default_answer = 500, 0
+
+        place = await get_place_async('Москва')
+
+        self.assertEqual(place, stale_place)
+        self.assertEqual(self.server.request_count, 1)
+
+    async def test_geocoder_error_without_place_is_raised(self):
+        self.server.default_answer = 500, 0
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await get_place_async('Москва')
+
+
+class CoordinatesCacheTest(TestCase):
+    def setUp(self):
+        caching.get_cache().clear()
+        self.place = Place.objects.create(address='москва', latitude='55.7', longitude='37.6')
+
+    def test_coordinates_are_forgotten_after_commit(self):
+        self.assertEqual(get_coordinates(['Москва']), {'москва': (Decimal('55.7'), Decimal('37.6'))})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place.latitude, self.place.longitude = Decimal('55.8'), Decimal('37.5')
+            self.place.save()
+            # A reader before the commit caches the old coordinates, they must not stay
+            get_coordinates(['Москва'])
+
+        self.assertEqual(get_coordinates(['Москва']), {'москва': (Decimal('55.8'), Decimal('37.5'))})
+
+    def test_deleted_place_is_forgotten(self):
+        get_coordinates(['Москва'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.place.delete()
+
+        self.assertEqual(get_coordinates(['Москва']), {})
+
+    def test_not_found_address_is_cached(self):
+        Place.objects.create(address='нигде', last_request=datetime.date.today())
+
+        self.assertEqual(get_coordinates(['Нигде']), {'нигде': None})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_coordinates(['Нигде']), {'нигде': None})
+
+
+class GeohashTest(SimpleTestCase):
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash('55.753900', '37.620800', 4), 'ucfv')
+
+    def test_covering_cells_hold_every_point_of_the_circle(self):
+        generator = random.Random(22)
+        for _ in range(300):
+            latitude, longitude = generator.uniform(-89, 89), generator.uniform(-180, 180)
+            radius_km = generator.choice([1, 10, 50, 300])
+            cells = get_covering_cells(latitude, longitude, radius_km)
+
+            # Points on the circle, in every direction
+            for bearing in range(0, 360, 15):
+                point_latitude, point_longitude = self.move(latitude, longitude, radius_km * 0.999, bearing)
+                self.assertIn(
+                    encode_geohash(point_latitude, point_longitude, BUCKET_PRECISION),
+                    cells,
+                    (latitude, longitude, radius_km, bearing),
+                )
+
+    def test_covering_cells_wrap_around_antimeridian(self):
+        cells = get_covering_cells(0, 179.99, 50)
+
+        self.assertIn(encode_geohash(0, -179.9, BUCKET_PRECISION), cells)
+        self.assertIn(encode_geohash(0, 179.9, BUCKET_PRECISION), cells)
+
+    def test_covering_cells_near_pole(self):
+        cells = get_covering_cells(89.9, 0, 50)
+
+        for longitude in range(-180, 180, 30):
+            self.assertIn(encode_geohash(89.9, longitude, BUCKET_PRECISION), cells)
+
+    def test_too_many_covering_cells(self):
+        self.assertIsNone(get_covering_cells(55.75, 37.62, 1000, max_cells=10))
+        self.assertIsNotNone(get_covering_cells(55.75, 37.62, 1, max_cells=10))
+
+    @staticmethod
+    def move(latitude, longitude, distance_km, bearing):
+        """Point at the distance along the bearing on a sphere."""
+        latitude, longitude, bearing = map(math.radians, (latitude, longitude, bearing))
+        angle = distance_km / EARTH_RADIUS_KM
+        moved_latitude = math.asin(
+            math.sin(latitude) * math.cos(angle) + math.cos(latitude) * math.sin(angle) * math.cos(bearing)
+        )
+        moved_longitude = longitude + math.atan2(
+            math.sin(bearing) * math.sin(angle) * math.cos(latitude),
+            math.cos(angle) - math.sin(latitude) * math.sin(moved_latitude),
+        )
+        return math.degrees(moved_latitude), (math.degrees(moved_longitude) + 180) % 360 - 180
+
+
+@override_settings(DISTANCE_MODE='haversine')
+class GridIndexTest(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(22)
+        self.points = [
+            (key, generator.uniform(55, 56.5), generator.uniform(36.5, 38.5), None)
+            for key in range(300)
+        ]
+        self.index = GridIndex(self.points)
+
+    def get_nearest_brute_force(self, latitude, longitude, k, radius_km, keys=None):
+        points = [point for point in self.points if keys is None or point[0] in keys]
+        distances = distance_matrix(
+            [(latitude, longitude)],
+            [(point_latitude, point_longitude) for _, point_latitude, point_longitude, _ in points],
+        )[0]
+        found = sorted((float(distance), point[0]) for point, distance in zip(points, distances) if distance <= radius_km)
+        return [key for _, key in found[:k]]
+
+    def test_matches_brute_force(self):
+        generator = random.Random(23)
+        for _ in range(100):
+            latitude, longitude = generator.uniform(55, 56.5), generator.uniform(36.5, 38.5)
+            radius_km = generator.choice([5, 20, 50, 200])
+            keys = set(generator.sample(range(300), 100)) if generator.random() < 0.5 else None
+
+            found = self.index.nearest(latitude, longitude, 10, radius_km, keys=keys)
+
+            self.assertEqual(
+                [key for key, _ in found],
+                self.get_nearest_brute_force(latitude, longitude, 10, radius_km, keys),
+            )
+            self.assertEqual([distance for _, distance in found], sorted(distance for _, distance in found))
+
+    def test_no_radius_looks_everywhere(self):
+        index = GridIndex([(1, 55.75, 37.61, None), (2, 59.93, 30.31, None)])
+
+        self.assertEqual(index.nearest(55.75, 37.61, 10, 50), [(1, 0.0)])
+        self.assertEqual([key for key, _ in index.nearest(55.75, 37.61, 10, None)], [1, 2])
+        self.assertEqual([key for key, _ in index.nearest(55.75, 37.61, 10, None, keys={2})], [2])
@@ -1,44 +1,63 @@
 import datetime
-from decimal import Decimal
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from django.conf import settings
-from django.db.models import ObjectDoesNotExist
+from django.db import transaction
 
 from foodcartapp.models import Restaurant
+from jobs.queue import enqueue
+from star_burger import caching
+from .cache import normalize_address
+from .geocoder import get_geocoder
 from .models import Place
 
+logger = logging.getLogger(__name__)
+
 
 def create_restaurant_places_if_not_exists():
-    restaurants_addresses = Restaurant.objects.all().values('address')
-    for address in restaurants_addresses:
+    restaurants_addresses = {
+        normalize_address(address)
+        for address in Restaurant.objects.exclude(address='').values_list('address', flat=True)
+    }
+    known_addresses = set(
+        Place.objects.filter(address__in=restaurants_addresses).values_list('address', flat=True)
+    )
+    missing_addresses = sorted(restaurants_addresses - known_addresses)
+    if not missing_addresses:
+        return
+
+    def geocode(address):
         try:
-            Place.objects.get(address=address)
-        except ObjectDoesNotExist:
-            restaurants_coordinates = fetch_coordinates(settings.YANDEX_GEOCODER_API_KEY, address=address)
-            if not restaurants_coordinates:
-                restaurants_coordinates = Decimal(0), Decimal(0)
-            Place.objects.create(
-                address=address,
-                longitude=restaurants_coordinates[1],
-                latitude=restaurants_coordinates[0],
-                last_request=datetime.date.today(),
-            )
-
-
-def fetch_coordinates(apikey, address):
-    base_url = "https://geocode-maps.yandex.ru/1.x"
-    response = requests.get(base_url, params={
-        "geocode": address,
-        "apikey": apikey,
-        "format": "json",
-    })
-    response.raise_for_status()
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
-
-    if not found_places:
-        return None
-
-    most_relevant = found_places[0]
-    lon, lat = most_relevant['GeoObject']['Point']['pos'].split(" ")
-    return lon, lat
+            return get_geocoder().fetch_coordinates(address)
+        except requests.RequestException as error:
+            logger.warning(f'Failed to geocode restaurant address {address}: {error!r}')
+            return error
+
+    with ThreadPoolExecutor(max_workers=settings.GEOCODER_MAX_WORKERS) as executor:
+        results = list(executor.map(geocode, missing_addresses))
+
+    places = []
+    failed_addresses = []
+    for address, coordinates in zip(missing_addresses, results):
+        if isinstance(coordinates, Exception):
+            failed_addresses.append(address)
+            continue
+        longitude, latitude = coordinates or (None, None)
+        place = Place(
+            address=address,
+            longitude=longitude,
+            latitude=latitude,
+            last_request=datetime.date.today(),
+        )
+        place.update_geohash()
+        places.append(place)
+    Place.objects.bulk_create(places, ignore_conflicts=True)
+    if places:
+        # Bulk queries send no signals, so cached locations are dropped and distances refreshed here
+        transaction.on_commit(lambda: caching.invalidate(caching.PLACES))
+        enqueue('foodcartapp.refresh_order_candidates')
+
+    if failed_addresses:
+        raise requests.ConnectionError(f'Failed to geocode restaurant addresses: {failed_addresses}')
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.core.management.base import BaseCommand
+
+from foodcartapp.capabilities import RestaurantCapabilityIndex
+from foodcartapp.catalog import get_available_products
+from foodcartapp.models import Order, OrderCandidate, Product, Restaurant
+from restaurateur.views import OrderFilterForm, get_board_orders
+
+
+def get_hot_queries():
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    filter_form = OrderFilterForm({})
+    filter_form.is_valid()
+    next_page_form = OrderFilterForm({'after': f'{Order.STATUS_PRIORITIES[Order.UNPROCESSED]}-0'})
+    next_page_form.is_valid()
+    order_ids = list(get_board_orders(filter_form).values_list('id', flat=True)[:page_size])
+    product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:100])
+
+    return [
+        ('view_orders: первая страница заказов', get_board_orders(filter_form)[:page_size + 1]),
+        ('view_orders: следующая страница заказов', get_board_orders(next_page_form)[:page_size + 1]),
+        (
+            'view_orders: рестораны-кандидаты заказов',
+            OrderCandidate.objects.filter(order__in=order_ids).select_related('restaurant').order_by('rank'),
+        ),
+        ('view_products: рестораны', Restaurant.objects.order_by('name', 'id')),
+        ('view_products: товары', Product.objects.select_related('category')),
+        (
+            'view_products: строки индекса ресторанов по товарам',
+            RestaurantCapabilityIndex.get_available_menu_items(product_ids),
+        ),
+        ('product_list_api: товары в продаже', get_available_products()),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Печатает планы выполнения запросов страниц менеджера и API, чтобы заметить пропавшие индексы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--analyze', action='store_true', help='выполнить запросы (EXPLAIN ANALYZE, только PostgreSQL)')
+
+    def handle(self, *args, **options):
+        explain_options = {'analyze': True} if options['analyze'] else {}
+        for title, queryset in get_hot_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            try:
+                self.stdout.write(str(queryset.query))
+            except EmptyResultSet:
+                # Filtered by an empty list, e.g. in an empty catalog, Django skips such a query
+                self.stdout.write('Нет данных, запрос не выполняется')
+            else:
+                self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
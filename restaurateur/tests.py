@@ -1,3 +1,112 @@
-from django.test import TestCase
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from foodcartapp.models import Order
+from restaurateur import views
+
+
+@override_settings(MANAGER_ORDERS_PAGE_SIZE=2)
+class OrdersPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='secret', is_staff=True)
+        statuses = [Order.DELIVERY, Order.UNPROCESSED, Order.ASSEMBLY, Order.UNPROCESSED, Order.DONE]
+        cls.orders = [
+            Order.info.create(
+                firstname='Иван',
+                lastname=f'Петров {number}',
+                phonenumber='+79001234567',
+                address='Москва',
+                status=status,
+            )
+            for number, status in enumerate(statuses)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        page_orders = [item['order_item'] for item in response.context['order_items']]
+        return page_orders, response.context['next_page_url']
+
+    def test_pages_follow_priority_without_gaps(self):
+        url = reverse('restaurateur:view_orders')
+        seen_orders = []
+        while url:
+            page_orders, next_page_url = self.get_page(url)
+            self.assertLessEqual(len(page_orders), 2)
+            seen_orders += page_orders
+            url = next_page_url and reverse('restaurateur:view_orders') + next_page_url
+
+        # Unprocessed first, then in assembly and in delivery, finished ones are hidden
+        self.assertEqual(seen_orders, [self.orders[index] for index in (1, 3, 2, 0)])
+
+    def test_filtered_orders_fill_one_page(self):
+        url = reverse('restaurateur:view_orders') + f'?status={Order.UNPROCESSED}'
+
+        page_orders, next_page_url = self.get_page(url)
+
+        self.assertEqual(page_orders, [self.orders[1], self.orders[3]])
+        self.assertIsNone(next_page_url)
+
+    def test_page_after_order(self):
+        priority = Order.STATUS_PRIORITIES[Order.UNPROCESSED]
+
+        page_orders, next_page_url = self.get_page(
+            reverse('restaurateur:view_orders') + f'?after={priority}-{self.orders[3].id}'
+        )
+
+        self.assertEqual(page_orders, [self.orders[2], self.orders[0]])
+        self.assertIsNone(next_page_url)
+
+    def test_invalid_cursor_shows_first_page(self):
+        page_orders, next_page_url = self.get_page(reverse('restaurateur:view_orders') + '?after=oops')
+
+        self.assertEqual(page_orders, [self.orders[1], self.orders[3]])
+        self.assertIn('after=1-', next_page_url)
+
+
+@override_settings(ORDER_EVENTS_STREAM_TIMEOUT=0)
+class OrderEventsStreamTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user('manager', password='secret', is_staff=True)
+
+    def setUp(self):
+        self.client.force_login(self.manager)
+        self.open_streams = threading.BoundedSemaphore(1)
+        patcher = mock.patch.object(views, '_open_streams', self.open_streams)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def read_stream(self):
+        response = self.client.get(reverse('restaurateur:order_events'))
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_stream_gives_its_place_back(self):
+        for _ in range(2):
+            self.assertEqual(self.read_stream(), 'retry: 3000\n\n')
+
+    def test_busy_streams_are_postponed(self):
+        self.open_streams.acquire()
+
+        self.assertEqual(self.read_stream(), 'retry: 15000\n\n')
+
+
+class ExplainHotQueriesTest(TestCase):
+    def test_empty_catalog(self):
+        stdout = StringIO()
+
+        call_command('explain_hot_queries', stdout=stdout)
+
+        self.assertIn('view_products: строки индекса ресторанов по товарам', stdout.getvalue())
+        self.assertIn('Нет данных, запрос не выполняется', stdout.getvalue())
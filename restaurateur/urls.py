@@ -13,6 +13,8 @@ urlpatterns = [
     path('restaurants/', views.view_restaurants, name="RestaurantView"),
 
     path('orders/', views.view_orders, name="view_orders"),
+    path('orders/events/', views.stream_order_events, name="order_events"),
+    path('orders/<int:order_id>/row/', views.view_order_row, name="order_row"),
 
     path('login/', views.LoginView.as_view(), name="login"),
     path('logout/', views.LogoutView.as_view(), name="logout"),
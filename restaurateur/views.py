@@ -1,18 +1,24 @@
-import logging
-from decimal import Decimal
+import json
+import threading
+import time
 
 from django import forms
+from django.conf import settings
 from django.contrib.auth import authenticate, login
 from django.contrib.auth import views as auth_views
 from django.contrib.auth.decorators import user_passes_test
+from django.db import connections
 from django.db.models import Prefetch
-from django.shortcuts import redirect, render
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.views import View
-from geopy import distance
 
-from foodcartapp.models import Product, Restaurant, RestaurantMenuItem, Order, OrderItem
-from places.models import Place
+from foodcartapp.capabilities import RestaurantCapabilityIndex
+from foodcartapp.events import get_broker
+from foodcartapp.models import Product, Restaurant, Order, OrderCandidate
+from places.cache import get_coordinates, normalize_address
+from star_burger.db_router import read_from_replica
 
 
 class Login(forms.Form):
@@ -32,6 +38,48 @@ class Login(forms.Form):
     )
 
 
+class OrderFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        label='Статус', required=False,
+        choices=[('', 'Все, кроме исполненных')] + Order.STATUS_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    restaurant = forms.ModelChoiceField(
+        label='Ресторан', required=False,
+        queryset=Restaurant.objects.order_by('name'),
+        empty_label='Все рестораны',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    registered_from = forms.DateTimeField(
+        label='Зарегистрирован с', required=False,
+        widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'})
+    )
+    registered_to = forms.DateTimeField(
+        label='по', required=False,
+        widget=forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'})
+    )
+    after = forms.RegexField(
+        regex=r'^\d+-\d+$', required=False,
+        widget=forms.HiddenInput
+    )
+
+    def filter(self, orders):
+        if self.cleaned_data['status']:
+            orders = orders.filter(status=self.cleaned_data['status'])
+        else:
+            orders = orders.exclude(status=Order.DONE)
+        if self.cleaned_data['restaurant']:
+            orders = orders.filter(restaurant=self.cleaned_data['restaurant'])
+        if self.cleaned_data['registered_from']:
+            orders = orders.filter(registered_at__gte=self.cleaned_data['registered_from'])
+        if self.cleaned_data['registered_to']:
+            orders = orders.filter(registered_at__lte=self.cleaned_data['registered_to'])
+        if self.cleaned_data['after']:
+            priority, order_id = self.cleaned_data['after'].split('-')
+            orders = orders.after(int(priority), int(order_id))
+        return orders
+
+
 class LoginView(View):
     def get(self, request, *args, **kwargs):
         form = Login()
@@ -68,14 +116,18 @@ def is_manager(user):
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica()
 def view_products(request):
-    restaurants = list(Restaurant.objects.order_by('name'))
-    products = list(Product.objects.prefetch_related('menu_items'))
+    restaurants = list(Restaurant.objects.order_by('name', 'id'))
+    products = list(Product.objects.select_related('category'))
+    # Availability rows come from the cache, menu items are queried only for products missing there
+    capability_index = RestaurantCapabilityIndex.get([product.id for product in products])
 
     products_with_restaurant_availability = []
     for product in products:
-        availability = {item.restaurant_id: item.availability for item in product.menu_items.all()}
-        ordered_availability = [availability.get(restaurant.id, False) for restaurant in restaurants]
+        ordered_availability = [
+            capability_index.is_available(product.id, restaurant.id) for restaurant in restaurants
+        ]
 
         products_with_restaurant_availability.append(
             (product, ordered_availability)
@@ -88,28 +140,26 @@ def view_products(request):
 
 
 @user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica()
 def view_restaurants(request):
     return render(request, template_name="restaurants_list.html", context={
         'restaurants': Restaurant.objects.all(),
     })
 
 
-@user_passes_test(is_manager, login_url='restaurateur:login')
-def view_orders(request):
-
-    queryset_order_item = OrderItem.objects.select_related('product')
-    prefetched_order_items = Prefetch('order_items', queryset=queryset_order_item)
-    orders = Order.info.total_price()\
+def get_board_orders(filter_form=None):
+    orders = Order.info\
         .select_related('restaurant')\
         .prefetch_related(
-            prefetched_order_items,)\
-        .order_by_priority()\
-        .exclude(status=Order.DONE)
+            Prefetch('candidates', queryset=OrderCandidate.objects.select_related('restaurant').order_by('rank'))
+        )\
+        .order_by_priority()
+    return filter_form.filter(orders) if filter_form else orders
 
-    all_restaurants = Restaurant.objects.prefetch_related(
-                Prefetch('menu_items', RestaurantMenuItem.objects.select_related('product').filter(availability=True)))
 
-    places = Place.objects.values('address', 'longitude', 'latitude').order_by('address')
+def get_view_order_items(orders):
+    # Restaurants and distances are precomputed by foodcartapp.candidates, only the client place is checked here
+    coordinates = get_coordinates([order.address for order in orders if not order.restaurant])
 
     view_order_items = []
     for order in orders:
@@ -119,54 +169,104 @@ def view_orders(request):
 
         # if order not designated to restaurant
         if not order.restaurant:
-            order_products = set()
-            for order_item in order.order_items.all():
-                order_products.add(order_item.product)
-
-            # comparing products set with restaurants available products
-            available_restaurants = []
-            for restaurant in all_restaurants:
-                restaurant_products = set()
-                for menu_item in restaurant.menu_items.all():
-                    restaurant_products.add(menu_item.product)
-                if order_products.issubset(restaurant_products):
-                    available_restaurants.append(restaurant)
-
-            # evaluate distance between client and available restaurants
-            restaurants = []
-            client_coordinates = next(
-                (coords['longitude'], coords['latitude']) for coords in places if coords['address'] == order.address
-            )
-            # Making list of pairs of available restaurant and distance from restaurant to client
-            for restaurant in available_restaurants:
-                distance_to_restaurant = None
-                if client_coordinates[0] != Decimal(0) and client_coordinates[1] != Decimal(0):
-                    restaurant_coordinates = next(
-                        (coords['longitude'], coords['latitude'])
-                        for coords in places if coords['address'] == restaurant.address
-                    )
-
-                    distance_to_restaurant = distance.distance(
-                        (client_coordinates[0], client_coordinates[1]),
-                        (restaurant_coordinates[0], restaurant_coordinates[1])
-                    ).km
-
-                    logging.debug(
-                        f'Distance to client {order.address} from resto {restaurant.address}: {distance_to_restaurant}')
-
-                    if distance_to_restaurant:
-                        distance_to_restaurant = round(Decimal(distance_to_restaurant), 3)
-                restaurants.append(
-                    {
-                        'restaurant': restaurant,
-                        'distance': distance_to_restaurant
-                    }
-                )
-            view_order_item['restaurants'] = sorted(restaurants, key=lambda restaurant: restaurant['distance'])
-            view_order_items.append(view_order_item)
-        else:
-            view_order_items.append(view_order_item)
+            # Geocoding runs in the background, so the client place may not exist yet
+            view_order_item['coordinates_pending'] = normalize_address(order.address) not in coordinates
+            # Candidates of a new order are found by a background job, until then there are none
+            view_order_item['candidates_pending'] = order.candidates_refreshed_at is None
+            view_order_item['restaurants'] = [
+                {
+                    'restaurant': candidate.restaurant,
+                    'distance': candidate.distance_km,
+                }
+                for candidate in order.candidates.all()
+            ]
+        view_order_items.append(view_order_item)
+    return view_order_items
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica()
+def view_orders(request):
+    # Taken before the orders are loaded, so the live feed replays changes made while the page renders
+    events_last_id = get_broker().get_last_event_id()
+
+    filter_form = OrderFilterForm(request.GET)
+    if not filter_form.is_valid():
+        filter_form = OrderFilterForm({})
+        filter_form.is_valid()
+
+    page_size = settings.MANAGER_ORDERS_PAGE_SIZE
+    orders = list(get_board_orders(filter_form)[:page_size + 1])
+
+    # Only orders of the current page get restaurants and distances computed
+    next_page_url = None
+    if len(orders) > page_size:
+        orders = orders[:page_size]
+        next_page_params = request.GET.copy()
+        next_page_params['after'] = f'{orders[-1].priority}-{orders[-1].id}'
+        next_page_url = f'?{next_page_params.urlencode()}'
+    first_page_params = request.GET.copy()
+    first_page_params.pop('after', None)
+
+    view_order_items = get_view_order_items(orders)
 
     return render(request, template_name='order_items.html', context={
         'order_items': view_order_items,
+        'filter_form': filter_form,
+        'next_page_url': next_page_url,
+        'first_page_url': f'?{first_page_params.urlencode()}' if 'after' in request.GET else None,
+        'live_insert': not any(request.GET.get(field) for field in filter_form.fields),
+        'events_last_id': events_last_id,
     })
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+@read_from_replica()
+def view_order_row(request, order_id):
+    order = get_object_or_404(
+        get_board_orders(),
+        id=order_id,
+    )
+    if order.status == Order.DONE:
+        return HttpResponse(status=204)
+    return render(request, template_name='order_row.html', context={
+        'item': get_view_order_items([order])[0],
+    })
+
+
+# Each open stream holds a worker thread, the rest are left for checkout and the other pages
+_open_streams = threading.BoundedSemaphore(settings.ORDER_EVENTS_MAX_STREAMS)
+
+
+@user_passes_test(is_manager, login_url='restaurateur:login')
+def stream_order_events(request):
+    broker = get_broker()
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID') or request.GET['last_id'])
+    except (KeyError, ValueError):
+        last_event_id = broker.get_last_event_id()
+
+    def stream_events(last_event_id):
+        # The stream stays open for a while and needs no database, so the connection is given back
+        connections.close_all()
+        if not _open_streams.acquire(blocking=False):
+            # Too many boards are open, the browser reconnects later instead of taking a thread
+            yield 'retry: 15000\n\n'
+            return
+        try:
+            yield 'retry: 3000\n\n'
+            deadline = time.monotonic() + settings.ORDER_EVENTS_STREAM_TIMEOUT
+            while time.monotonic() < deadline:
+                events = broker.listen(last_event_id, timeout=min(15, deadline - time.monotonic()))
+                if not events:
+                    yield ': keep-alive\n\n'
+                for event_id, event in events:
+                    yield f'id: {event_id}\ndata: {json.dumps(event)}\n\n'
+                    last_event_id = event_id
+        finally:
+            _open_streams.release()
+
+    response = StreamingHttpResponse(stream_events(last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
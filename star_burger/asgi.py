@@ -0,0 +1,31 @@
+"""
+ASGI config for Django project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
+"""
+
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "star_burger.settings")
+django_application = get_asgi_application()
+
+from places.geocoder import get_geocoder  # noqa: E402 needs the apps loaded
+
+
+async def application(scope, receive, send):
+    # Django 3.2 does not handle lifespan, the geocoder client lives as long as the worker
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await get_geocoder().start_async()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await get_geocoder().aclose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
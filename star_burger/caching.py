@@ -0,0 +1,90 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.core import cache as django_cache
+from django.core.cache import DEFAULT_CACHE_ALIAS
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+CATALOG = 'catalog'
+PLACES = 'places'
+RESTAURANT_CAPABILITY = 'restaurant_capability'
+RESTAURANT_LOCATIONS = 'restaurant_locations'
+BANNERS = 'banners'
+
+VERSION_KEY = 'star_burger:{namespace}:version'
+KEY = 'star_burger:{namespace}:{version}:{key}'
+
+_missing = object()
+
+
+def get_cache():
+    # Looked up on every call, the debug toolbar swaps django.core.cache.caches to count hits and misses
+    return django_cache.caches[DEFAULT_CACHE_ALIAS]
+
+
+def get_namespace_version(namespace):
+    """Version of the namespace, the time of its last invalidation in milliseconds."""
+    cache = get_cache()
+    version_key = VERSION_KEY.format(namespace=namespace)
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, int(time.time() * 1000), None)
+        version = cache.get(version_key)
+    return version
+
+
+def invalidate(namespace):
+    """Drop every key of the namespace at once by moving it to a new version."""
+    cache = get_cache()
+    version_key = VERSION_KEY.format(namespace=namespace)
+    previous_version = cache.get(version_key) or 0
+    cache.set(version_key, max(int(time.time() * 1000), previous_version + 1), None)
+
+
+def make_key(namespace, *parts, version=None):
+    """Key of the parts in the current version of the namespace.
+
+    Pass the version when making many keys at once to save a cache lookup per key.
+    """
+    key = ':'.join(str(part) for part in parts)
+    # Memcached-like backends reject long keys and keys with spaces, addresses have both
+    if len(key) > 100 or not key.isprintable() or ' ' in key:
+        key = hashlib.md5(key.encode()).hexdigest()
+    if version is None:
+        version = get_namespace_version(namespace)
+    return KEY.format(namespace=namespace, version=version, key=key)
+
+
+def delete(namespace, *parts):
+    get_cache().delete(make_key(namespace, *parts))
+
+
+def cached(namespace, timeout=DEFAULT_TIMEOUT, key_func=None):
+    """Cache results of the function in the namespace.
+
+    The key is made of the function name and its arguments, or of the parts
+    returned by key_func called with the same arguments, so views have to pass
+    one picking the relevant parts of the request. None results are cached too.
+    `wrapper.invalidate()` drops the whole namespace.
+    """
+    def decorator(func):
+        func_name = f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if key_func:
+                parts = key_func(*args, **kwargs)
+            else:
+                parts = (*args, *sorted(kwargs.items()))
+            cache_key = make_key(namespace, func_name, *parts)
+            cache = get_cache()
+            result = cache.get(cache_key, _missing)
+            if result is _missing:
+                result = func(*args, **kwargs)
+                cache.set(cache_key, result, timeout)
+            return result
+
+        wrapper.invalidate = lambda: invalidate(namespace)
+        return wrapper
+    return decorator
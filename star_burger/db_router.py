@@ -0,0 +1,148 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+STICKY_COOKIE = 'read_primary'
+
+_reads_from_replica = ContextVar('reads_from_replica', default=False)
+_sticks_to_primary = ContextVar('sticks_to_primary', default=False)
+# Set by the middleware for the time of a request, the router marks it when something is written
+_request_writes = ContextVar('request_writes', default=None)
+# Set by functions decorated with read_from_replica, to know which replica to skip if they fail
+_used_replicas = ContextVar('used_replicas', default=None)
+
+_replica_down_until = {}
+
+
+class read_from_replica:
+    """Send reads inside to a replica, works as a decorator of views too.
+
+    Only wrap code which can show data a few seconds old. A decorated function failing
+    on a replica, e.g. one which went down mid-request, is run again on the primary.
+    """
+
+    def __enter__(self):
+        self.token = _reads_from_replica.set(True)
+
+    def __exit__(self, *exc_info):
+        _reads_from_replica.reset(self.token)
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            used_replicas = []
+            token = _used_replicas.set(used_replicas)
+            try:
+                with read_from_replica():
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if not used_replicas:
+                    raise
+                for alias in used_replicas:
+                    mark_replica_down(alias, error)
+                with read_from_primary():
+                    return func(*args, **kwargs)
+            finally:
+                _used_replicas.reset(token)
+        return wrapper
+
+
+@contextmanager
+def read_from_primary():
+    """Send reads inside to the primary, for data put into the cache for a long time."""
+    token = _reads_from_replica.set(False)
+    try:
+        yield
+    finally:
+        _reads_from_replica.reset(token)
+
+
+def mark_replica_down(alias, error):
+    logger.warning(f'Replica {alias} is unavailable, reading from the primary: {error!r}')
+    _replica_down_until[alias] = time.monotonic() + settings.DATABASE_REPLICA_RETRY_SECONDS
+
+
+def is_replica_available(alias):
+    if time.monotonic() < _replica_down_until.get(alias, 0):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError as error:
+        mark_replica_down(alias, error)
+        return False
+    return True
+
+
+class ReplicaRouter:
+    """Writes go to the primary, reads too unless they are wrapped in read_from_replica.
+
+    Sessions which have just written read from the primary for a while, see
+    sticky_primary_middleware. Replicas which do not connect are skipped.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not settings.DATABASE_REPLICAS or not _reads_from_replica.get() or _sticks_to_primary.get():
+            return None
+        # Reads inside a transaction have to see its writes
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [alias for alias in settings.DATABASE_REPLICAS if is_replica_available(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        alias = random.choice(replicas)
+        used_replicas = _used_replicas.get()
+        if used_replicas is not None:
+            used_replicas.append(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        request_writes = _request_writes.get()
+        if request_writes is not None:
+            request_writes.append(model._meta.label)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def sticky_primary_middleware(get_response):
+    """Keep a client reading from the primary for a while after its request wrote something.
+
+    Otherwise a manager could save an order and see the old one, replicas lag behind.
+    """
+    def middleware(request):
+        request_writes = []
+        writes_token = _request_writes.set(request_writes)
+        sticks_token = _sticks_to_primary.set(STICKY_COOKIE in request.COOKIES)
+        try:
+            response = get_response(request)
+        finally:
+            _request_writes.reset(writes_token)
+            _sticks_to_primary.reset(sticks_token)
+
+        if request_writes and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=settings.DATABASE_REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+    return middleware
@@ -0,0 +1,114 @@
+import hmac
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+KNOWN_METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+REQUESTS = Counter(
+    'star_burger_requests_total',
+    'Запросы по view, методу и коду ответа',
+    ['view', 'method', 'status'],
+)
+REQUEST_DURATION = Histogram(
+    'star_burger_request_duration_seconds',
+    'Время ответа',
+    ['view', 'method'],
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'star_burger_request_db_queries',
+    'Запросов к БД за запрос',
+    ['view'],
+    buckets=[0, 1, 2, 5, 10, 20, 50, 100, 200, 500],
+)
+REQUEST_DB_DURATION = Histogram(
+    'star_burger_request_db_duration_seconds',
+    'Время запросов к БД за запрос',
+    ['view'],
+    buckets=[0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5],
+)
+GEOCODER_REQUESTS = Counter(
+    'star_burger_geocoder_requests_total',
+    'Запросы к геокодеру: ok, error или rejected, когда цепь разомкнута',
+    ['outcome'],
+)
+GEOCODER_DURATION = Histogram(
+    'star_burger_geocoder_request_duration_seconds',
+    'Время ответа геокодера',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+)
+
+
+class QueryTimer:
+    """Execute wrapper counting queries of a request and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started_at
+
+
+def get_view_name(request):
+    # Unmatched urls share a label, otherwise every scanned path would make a new time series
+    resolver_match = getattr(request, 'resolver_match', None)
+    return resolver_match.view_name if resolver_match else 'unresolved'
+
+
+def metrics_middleware(get_response):
+    """Record latency and database queries of every request by view name.
+
+    Streaming responses are measured until their first byte.
+    """
+    def middleware(request):
+        query_timer = QueryTimer()
+        started_at = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(query_timer))
+            response = get_response(request)
+        duration = time.perf_counter() - started_at
+
+        view_name = get_view_name(request)
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        REQUESTS.labels(view_name, method, response.status_code).inc()
+        REQUEST_DURATION.labels(view_name, method).observe(duration)
+        REQUEST_DB_QUERIES.labels(view_name).observe(query_timer.count)
+        REQUEST_DB_DURATION.labels(view_name).observe(query_timer.duration)
+        return response
+    return middleware
+
+
+def get_registry():
+    # Gunicorn workers write their metrics to files of the directory, they are summed up on every scrape
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def is_metrics_reader(request):
+    authorization = request.headers.get('Authorization', '').encode()
+    if settings.METRICS_TOKEN and hmac.compare_digest(authorization, f'Bearer {settings.METRICS_TOKEN}'.encode()):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics_view(request):
+    if not is_metrics_reader(request):
+        return HttpResponseForbidden()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
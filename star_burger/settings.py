@@ -13,6 +13,24 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 SECRET_KEY = env('SECRET_KEY')
 YANDEX_GEOCODER_API_KEY = env('YANDEX_GEOCODER_API_KEY')
+GEOCODER_CACHE_TTL_DAYS = env.int('GEOCODER_CACHE_TTL_DAYS', 30)
+GEOCODER_NOT_FOUND_TTL_DAYS = env.int('GEOCODER_NOT_FOUND_TTL_DAYS', 1)
+GEOCODER_MAX_WORKERS = env.int('GEOCODER_MAX_WORKERS', 4)
+GEOCODER_URL = env('GEOCODER_URL', 'https://geocode-maps.yandex.ru/1.x')
+GEOCODER_TIMEOUT = env.float('GEOCODER_TIMEOUT', 5)
+GEOCODER_RETRIES = env.int('GEOCODER_RETRIES', 2)
+GEOCODER_RETRY_BACKOFF = env.float('GEOCODER_RETRY_BACKOFF', 0.5)
+GEOCODER_CHECKOUT_TIMEOUT = env.float('GEOCODER_CHECKOUT_TIMEOUT', 3)
+GEOCODER_CIRCUIT_FAILURES = env.int('GEOCODER_CIRCUIT_FAILURES', 5)
+GEOCODER_CIRCUIT_RESET_TIMEOUT = env.int('GEOCODER_CIRCUIT_RESET_TIMEOUT', 30)
+DISTANCE_MODE = env('DISTANCE_MODE', 'haversine')
+ORDER_CANDIDATES_RADIUS_KM = env.float('ORDER_CANDIDATES_RADIUS_KM', 50)
+ORDER_CANDIDATES_LIMIT = env.int('ORDER_CANDIDATES_LIMIT', 10)
+MANAGER_ORDERS_PAGE_SIZE = env.int('MANAGER_ORDERS_PAGE_SIZE', 50)
+ORDER_EVENTS_BACKEND = env('ORDER_EVENTS_BACKEND', 'foodcartapp.events.CacheBroker')
+ORDER_EVENTS_STREAM_TIMEOUT = env.int('ORDER_EVENTS_STREAM_TIMEOUT', 60)
+ORDER_EVENTS_MAX_STREAMS = env.int('ORDER_EVENTS_MAX_STREAMS', 4)
+METRICS_TOKEN = env('METRICS_TOKEN', '')
 DEBUG = env.bool('DEBUG', False)
 ROLLBAR_TOKEN = env('ROLLBAR_ACCESS_TOKEN')
 ROLLBAR_ENVIRONMENT = env('ROLLBAR_ENVIRONMENT', 'development')
@@ -23,6 +41,8 @@ INSTALLED_APPS = [
     'foodcartapp.apps.FoodcartappConfig',
     'restaurateur.apps.RestaurateurConfig',
     'places.apps.PlacesConfig',
+    'jobs.apps.JobsConfig',
+    'benchmarks.apps.BenchmarksConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -35,11 +55,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'star_burger.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'star_burger.db_router.sticky_primary_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -100,6 +122,21 @@ DATABASES = {
         conn_health_checks=True,
     )
 }
+DATABASE_REPLICAS = []
+for number, replica_url in enumerate(env.list('DB_REPLICA_CONFIG_URLS', []), start=1):
+    DATABASES[f'replica{number}'] = {
+        **dj_database_url.parse(replica_url, conn_max_age=600, conn_health_checks=True),
+        # Tests read replicas from the test database of the primary
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+DATABASE_ROUTERS = ['star_burger.db_router.ReplicaRouter']
+DATABASE_REPLICA_STICKY_SECONDS = env.int('DB_REPLICA_STICKY_SECONDS', 10)
+DATABASE_REPLICA_RETRY_SECONDS = env.int('DB_REPLICA_RETRY_SECONDS', 30)
+
+CACHES = {
+    'default': env.dj_cache_url('CACHE_URL', 'locmem://'),
+}
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -139,3 +176,18 @@ STATICFILES_DIRS = [
 ]
 
 PHONENUMBER_DEFAULT_REGION = 'RU'
+
+API_JSON_COMPACT = env.bool('API_JSON_COMPACT', True)
+IDEMPOTENCY_KEY_TTL_HOURS = env.int('IDEMPOTENCY_KEY_TTL_HOURS', 24)
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'foodcartapp.renderers.ApiJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+JOB_QUEUE_BACKEND = env('JOB_QUEUE_BACKEND', 'jobs.queue.DatabaseBackend')
+JOB_RETRY_DELAY = env.int('JOB_RETRY_DELAY', 30)
+# Running jobs claimed longer ago are considered lost with their crashed worker
+JOB_LEASE_SECONDS = env.int('JOB_LEASE_SECONDS', 60 * 10)
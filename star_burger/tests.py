@@ -0,0 +1,66 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import OperationalError, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase
+
+from foodcartapp.models import Order
+from star_burger import db_router
+from star_burger.db_router import STICKY_COOKIE, read_from_replica, sticky_primary_middleware
+
+REPLICA = 'replica1'
+
+
+def fail_query(execute, sql, params, many, context):
+    raise OperationalError('server closed the connection unexpectedly')
+
+
+@skipUnless(REPLICA in settings.DATABASES, 'needs a replica, e.g. DB_REPLICA_CONFIG_URLS=$DB_CONFIG_URL')
+class ReplicaRouterTest(TransactionTestCase):
+    # The replica mirrors the test database of the primary, see TEST in settings.DATABASES.
+    # Not a TestCase, the router reads from the primary inside transactions.
+    databases = {'default', *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        db_router._replica_down_until.clear()
+        self.factory = RequestFactory()
+
+    @staticmethod
+    @read_from_replica()
+    def read_view(request):
+        return HttpResponse(router.db_for_read(Order))
+
+    @staticmethod
+    def write_view(request):
+        Order.info.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва')
+        return HttpResponse()
+
+    def test_reads_go_to_replica(self):
+        response = sticky_primary_middleware(self.read_view)(self.factory.get('/'))
+
+        self.assertEqual(response.content.decode(), REPLICA)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_reads_after_write_stick_to_primary(self):
+        response = sticky_primary_middleware(self.write_view)(self.factory.post('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = response.cookies[STICKY_COOKIE].value
+        response = sticky_primary_middleware(self.read_view)(request)
+
+        self.assertEqual(response.content.decode(), 'default')
+
+    def test_failing_replica_is_retried_on_primary(self):
+        @read_from_replica()
+        def count_orders():
+            return Order.info.count()
+
+        Order.info.create(firstname='Иван', lastname='Петров', phonenumber='+79001234567', address='Москва')
+        with connections[REPLICA].execute_wrapper(fail_query):
+            self.assertEqual(count_orders(), 1)
+
+        self.assertFalse(db_router.is_replica_available(REPLICA))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Order), 'default')